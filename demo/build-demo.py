@@ -104,28 +104,34 @@ if build_sysroot:
 
     run(args)
 
-# Build the demo.
-run(['pyqtdeploy-build', '--target', target, '--sysroot', sysroot_dir,
-            '--build-dir', build_dir, 'pyqt-demo.pdy'])
+# Build the demo.  Except when targeting iOS (when we leave it to Xcode)
+# pyqtdeploy-build also runs qmake and make using the qmake left by
+# pyqtdeploy-sysroot.
+args = ['pyqtdeploy-build', '--target', target, '--sysroot', sysroot_dir,
+        '--build-dir', build_dir]
 
-# Run qmake.  Use the qmake left by pyqtdeploy-sysroot.
-os.chdir(build_dir)
-run([os.path.join(host_bin_dir, 'qmake')])
-
-# Run make. (When targeting iOS we leave it to Xcode.)
 if target.startswith('ios'):
     pass
 else:
+    args.append('--make')
+
+args.append('pyqt-demo.pdy')
+
+run(args)
+
+if target.startswith('ios'):
+    # Run qmake.  Use the qmake left by pyqtdeploy-sysroot.
+    os.chdir(build_dir)
+    run([os.path.join(host_bin_dir, 'qmake')])
+elif target.startswith('android'):
     # We only support MSVC on Windows.
     make = 'nmake' if sys.platform == 'win32' else 'make'
 
-    run([make])
-
-    if target.startswith('android'):
-        run([make, 'INSTALL_ROOT=deploy', 'install'])
-        run([os.path.join(host_bin_dir, 'androiddeployqt'), '--input',
-                'android-libpyqt-demo.so-deployment-settings.json', '--output',
-                'deploy'])
+    os.chdir(build_dir)
+    run([make, 'INSTALL_ROOT=deploy', 'install'])
+    run([os.path.join(host_bin_dir, 'androiddeployqt'), '--input',
+            'android-libpyqt-demo.so-deployment-settings.json', '--output',
+            'deploy'])
 
 # Tell the user where the demo is.
 if target.startswith('android'):
@@ -29,6 +29,7 @@ from .builder import Builder
 from .message_handler import MessageHandler
 from .project import Project
 from .sysroot import Sysroot
+from .tracer import Tracer
 from .user_exception import UserException
 from .version import PYQTDEPLOY_RELEASE
 
@@ -25,24 +25,38 @@
 
 
 import csv
+import fnmatch
 import glob
+import heapq
+import io
+import multiprocessing
 import os
+import posixpath
+import re
 import shlex
 import shutil
+import struct
+import subprocess
+import time
+import zlib
 
 from PyQt5.QtCore import (QByteArray, QCoreApplication, QDir, QFile,
-        QFileDevice, QFileInfo, QProcess, QTemporaryDir, QTextCodec)
+        QFileInfo, QIODevice, QProcess, QTemporaryDir, QTextCodec)
 
-from ..file_utilities import (create_file, get_embedded_dir,
-        get_embedded_file_for_version, read_embedded_file)
-from ..metadata import (external_libraries_metadata, get_python_metadata,
+from ..file_utilities import (get_embedded_dir, get_embedded_file_for_version,
+        read_embedded_file)
+from ..metadata import (external_libraries_metadata,
+        get_extension_library_dir, get_extension_library_name,
+        get_extension_module_configuration, get_python_metadata,
         pyqt4_metadata, pyqt5_metadata)
 from ..project import QrcDirectory
-from ..platforms import Architecture, Platform
+from ..platforms import Architecture
 from ..user_exception import UserException
 from ..version import PYQTDEPLOY_HEXVERSION
 from ..windows import get_py_install_path
 
+from .import_analyser import ImportAnalyser
+
 
 class Builder:
     """ The builder for a project. """
@@ -56,16 +70,73 @@ class Builder:
         self._host = Architecture.architecture()
         self._target = Architecture.architecture(target_arch_name)
 
-    def build(self, opt, nr_resources, clean, sysroot, build_dir, include_dir, interpreter, python_library, source_dir, standard_library_dir):
-        """ Build the project in a given directory.  Raise a UserException if
-        there is an error.
+    def build(self, opt, nr_resources, clean, sysroot, build_dir, include_dir, interpreter, python_library, source_dir, standard_library_dir, nr_jobs=0, cache_dir=None, cache_size=0, archive=False, import_stats=False, unreachable=None, external_resources=False, startup_modules=None, nr_deferred=1, compress_level=None, compress_threshold=None, no_compress=(), cython=None, ninja=False, qmake=None, make=False):
+        """ Build the project in a given directory.  nr_resources is the
+        number of .qrc files to create where 0 means a number based on the
+        size of the resources and the number of CPUs.  nr_jobs is the number of
+        jobs to run at a time where 0 means the number of CPUs.  cache_dir is
+        the name of an optional directory used to cache frozen modules between
+        builds.  cache_size is the maximum size of the cache in bytes where 0
+        means there is no limit.  archive is set if the frozen modules are to
+        be stored in a single archive rather than as individual resources.
+        import_stats is set if the application should always record import
+        statistics.  unreachable is 'report' if frozen modules that cannot be
+        reached by the application's imports should be reported and 'exclude'
+        if they should also be excluded.  external_resources is set if the
+        resources should be compiled to binary .rcc files that are loaded by
+        the application at run time rather than being linked in.
+        startup_modules is the name of an optional file containing the names
+        of the modules imported when the application starts.  Any other
+        modules are placed in nr_deferred binary .rcc files that are loaded by
+        the application when first needed.  compress_level and
+        compress_threshold are the optional compression level and threshold
+        passed to rcc.  no_compress is a sequence of glob patterns matched
+        against the resource path of each file, or the name of each module and
+        its parent packages, that identify those files that are never
+        compressed.  cython is the name of the Cython executable used to
+        compile any modules specified by the project to C.  ninja is set if a
+        build.ninja file should also be generated.  qmake is the name of the
+        qmake executable used to determine the compiler and linker flags and
+        defaults to the one in the sysroot, if any.  make is set if the
+        application should then be built by running qmake and make (or
+        ninja), nr_jobs at a time.  Raise a UserException if there is an
+        error.
         """
 
         project = self._project
 
+        # The time taken by each phase of the build.
+        timings = []
+        start_time = time.time()
+
         py_major, py_minor, py_patch = project.python_target_version
         py_version = (py_major << 16) + (py_minor << 8) + py_patch
 
+        if external_resources and self._target.platform.name in ('android', 'ios'):
+            raise UserException(
+                    "External resources are not supported for {0} "
+                    "targets".format(self._target.platform.name))
+
+        if ninja and self._target.platform.name not in ('linux', 'macos'):
+            raise UserException(
+                    "Ninja is not supported for {0} targets".format(
+                            self._target.platform.name))
+
+        if make and self._target.platform.name == 'ios':
+            raise UserException(
+                    "Building the application is not supported for ios "
+                    "targets")
+
+        if startup_modules:
+            if archive:
+                raise UserException(
+                        "Deferred resources cannot be used with an archive")
+
+            if self._target.platform.name in ('android', 'ios'):
+                raise UserException(
+                        "Deferred resources are not supported for {0} "
+                        "targets".format(self._target.platform.name))
+
         # Set $SYSROOT.  An explicit sysroot will override any existing value.
         if sysroot:
             os.environ['SYSROOT'] = os.path.abspath(sysroot)
@@ -163,13 +234,20 @@ class Builder:
                     "Cleaning {0}".format(native_build_dir))
             shutil.rmtree(native_build_dir, ignore_errors=True)
 
-        # Now start the build.
+        # Now start the build.  We keep track of every file written to the
+        # build directory so that those left over from a previous build can be
+        # removed.
         self._create_directory(self._build_dir)
+        self._outputs = set()
 
-        # Create the job file and writer.
-        job_filename = QDir.toNativeSeparators(temp_dir.path() + '/jobs.csv')
-        job_file = open(job_filename, 'w', newline='')
-        job_writer = csv.writer(job_file)
+        # Save the policy used to compress the resources.
+        self._compress_level = compress_level
+        self._compress_threshold = compress_threshold
+        self._no_compress = no_compress
+
+        # The freeze jobs are collected and run once the contents of the
+        # application have been finalised.
+        jobs = []
 
         # Freeze the bootstrap.  Note that from Python v3.5 the modified part
         # is in _bootstrap_external.py and _bootstrap.py is unchanged from the
@@ -177,15 +255,15 @@ class Builder:
         # as it still needs to be frozen and we don't want to depend on an
         # external source.
         self._freeze_bootstrap('bootstrap', py_version, self._build_dir,
-                temp_dir, job_writer)
+                temp_dir, jobs)
 
         if py_version >= 0x030500:
             self._freeze_bootstrap('bootstrap_external', py_version,
-                    self._build_dir, temp_dir, job_writer)
+                    self._build_dir, temp_dir, jobs)
 
         # Freeze any main application script.
         if project.application_script != '':
-            self._freeze(job_writer, self._build_dir + '/frozen_main.h',
+            self._freeze(jobs, self._build_dir + '/frozen_main.h',
                     project.path_from_user(project.application_script),
                     'pyqtdeploy_main', as_c=True)
 
@@ -197,38 +275,135 @@ class Builder:
                         PYQTDEPLOY_HEXVERSION))
         version_f.close()
 
-        # Generate the application resource.
-        resource_names = self._generate_resource(
-                self._build_dir + '/resources', required_py,
-                standard_library_dir, job_writer, nr_resources)
+        # Generate the contents of the application resource.
+        resources_dir = self._build_dir + '/resources'
+        resource_contents = self._generate_resource(resources_dir,
+                required_py, standard_library_dir, jobs)
 
-        # Write the .pro file.
-        self._write_qmake(py_version, required_ext, required_libraries,
-                include_dir, python_library, standard_library_dir, source_dir,
-                job_writer, opt, resource_names)
+        # Handle any unreachable modules.
+        if unreachable:
+            resource_contents = self._handle_unreachable(resource_contents,
+                    jobs, metadata, required_modules,
+                    exclude=(unreachable == 'exclude'))
+
+        # Compile any modules to C with Cython.
+        cython_sources = self._cythonize(resource_contents, jobs, temp_dir,
+                cython, py_major)
+
+        # Get the index of the modules in the resource.
+        module_index = self._get_module_index(resource_contents)
+
+        # Write the job file.
+        job_filename = QDir.toNativeSeparators(temp_dir.path() + '/jobs.csv')
+
+        with open(job_filename, 'w', newline='') as job_file:
+            job_writer = csv.writer(job_file)
+
+            for job in jobs:
+                self._add_output(job[0])
+                job_writer.writerow(job)
 
         # Run the freeze jobs.
-        job_file.close()
 
         # The odd naming of Python source files is to prevent them from being
         # frozen if we deploy ourself.
         freeze = self._copy_lib_file(self._get_lib_file_name('freeze.python'),
                 temp_dir.path(), dst_file_name='freeze.py')
 
-        self._run_freeze(freeze, interpreter, job_filename, opt)
+        freeze_start_time = time.time()
+        self._run_freeze(freeze, interpreter, job_filename, opt, nr_jobs,
+                cache_dir, cache_size)
+        freeze_time = time.time() - freeze_start_time
+
+        # Pack the frozen modules if required.
+        if archive:
+            resource_contents = self._write_archive(resources_dir,
+                    resource_contents, module_index)
+
+        # Separate any modules whose loading is to be deferred.
+        if startup_modules:
+            resource_contents, deferred_contents = self._split_deferred(
+                    resource_contents, startup_modules, metadata,
+                    required_modules)
+        else:
+            deferred_contents = []
+
+        # Write the .qrc files.
+        resource_names = self._write_resources(resources_dir,
+                resource_contents, nr_resources)
 
-    def _freeze_bootstrap(self, name, py_version, build_dir, temp_dir, job_writer):
+        bundles = {}
+        deferred_names = []
+
+        if deferred_contents:
+            for bundle, contents in enumerate(
+                    self._partition_resources(resources_dir,
+                            deferred_contents, nr_deferred)):
+                deferred_names.append(
+                        self._write_resource(resources_dir, contents, bundle,
+                                prefix='pyqtdeploy_deferred'))
+
+                for content in contents:
+                    bundles[self._get_index_name(content)] = bundle + 1
+
+        # Write the index of the modules.
+        self._write_module_index(module_index, bundles)
+
+        # Write the .pro file.
+        self._write_qmake(py_version, required_ext, required_libraries,
+                include_dir, python_library, standard_library_dir, source_dir,
+                jobs, opt, resource_names, import_stats, external_resources,
+                deferred_names, cython_sources)
+
+        qmake = self._get_qmake(qmake)
+
+        # Write the build.ninja file.
+        if ninja:
+            binary_names = list(deferred_names)
+            if external_resources:
+                binary_names.extend(resource_names)
+
+            ninja_objects = self._write_ninja(qmake, resources_dir,
+                    resource_names + deferred_names, binary_names)
+        else:
+            ninja_objects = None
+
+        # Remove anything left over from a previous build.
+        self._update_manifest()
+
+        timings.append(
+                ("generating", time.time() - start_time - freeze_time))
+        timings.append(("freezing", freeze_time))
+
+        # Build the application if required.
+        if make:
+            if nr_jobs <= 0:
+                nr_jobs = multiprocessing.cpu_count()
+
+            if ninja_objects is None:
+                self._make(qmake, nr_jobs, timings)
+            else:
+                self._make_ninja(ninja_objects, nr_jobs, timings)
+
+        self._message_handler.progress_message(
+                "Time taken: " + ', '.join(
+                        ["{0} {1:.1f}s".format(phase, duration)
+                                for phase, duration in timings]))
+
+    def _freeze_bootstrap(self, name, py_version, build_dir, temp_dir, jobs):
         """ Freeze a version dependent bootstrap script. """
 
         bootstrap_src = get_embedded_file_for_version(py_version, __file__,
                 'lib', name)
         bootstrap = self._copy_lib_file(bootstrap_src, temp_dir.path(),
                 dst_file_name=name + '.py')
-        self._freeze(job_writer, build_dir + '/frozen_' + name + '.h',
+        self._freeze(jobs, build_dir + '/frozen_' + name + '.h',
                 bootstrap, 'pyqtdeploy_' + name, as_c=True)
 
-    def _generate_resource(self, resources_dir, required_py, standard_library_dir, job_writer, nr_resources):
-        """ Generate the application resource. """
+    def _generate_resource(self, resources_dir, required_py, standard_library_dir, jobs):
+        """ Generate the application resource and return its contents
+        relative to the resources directory.
+        """
 
         project = self._project
 
@@ -247,16 +422,16 @@ class Builder:
                 package_name = fi.completeBaseName()
 
             self._write_package(resource_contents, resources_dir, package_name,
-                    project.application_package, package_src_dir, job_writer)
+                    project.application_package, package_src_dir, jobs)
 
         # Handle the Python standard library.
         self._write_stdlib_py(resource_contents, resources_dir, required_py,
-                standard_library_dir, job_writer)
+                standard_library_dir, jobs)
 
         # Handle any additional packages.
         for package in project.other_packages:
             self._write_package(resource_contents, resources_dir, '', package,
-                    project.path_from_user(package.name), job_writer)
+                    project.path_from_user(package.name), jobs)
 
         # Handle the PyQt package.
         if len(project.pyqt_modules) != 0:
@@ -266,7 +441,7 @@ class Builder:
 
             self._create_directory(pyqt_dst_dir)
 
-            self._freeze(job_writer, pyqt_dst_dir + '/__init__.pyo',
+            self._freeze(jobs, pyqt_dst_dir + '/__init__.pyo',
                     pyqt_src_dir + '/__init__.py',
                     pyqt_subdir + '/__init__.py')
 
@@ -280,56 +455,281 @@ class Builder:
                 else:
                     skip_dirs.append('port_v3')
 
-                def copy_freeze(src, dst):
-                    for skip in skip_dirs:
-                        if skip in src:
-                            break
-                    else:
-                        if dst.endswith('.py'):
-                            src = QDir.fromNativeSeparators(src)
-                            dst = QDir.fromNativeSeparators(dst)
-                            rel_dst = dst[len(resources_dir) + 1:] + 'o'
+                # Note that we sort the names so that the output is
+                # reproduceable.
+                uic_src_dir = QDir.toNativeSeparators(pyqt_src_dir + '/uic')
+
+                for src_dir, dir_names, file_names in os.walk(uic_src_dir):
+                    dir_names[:] = sorted(
+                            [d for d in dir_names if d not in skip_dirs])
+
+                    src_dir = QDir.fromNativeSeparators(src_dir)
+                    rel_dir = pyqt_subdir + src_dir[len(pyqt_src_dir):]
 
-                            self._freeze(job_writer, dst + 'o', src, rel_dst)
+                    self._create_directory(resources_dir + '/' + rel_dir)
+
+                    for file_name in sorted(file_names):
+                        if file_name.endswith('.py'):
+                            rel_dst = rel_dir + '/' + file_name + 'o'
+
+                            self._freeze(jobs,
+                                    resources_dir + '/' + rel_dst,
+                                    src_dir + '/' + file_name, rel_dst)
 
                             resource_contents.append(rel_dst)
 
-                shutil.copytree(QDir.toNativeSeparators(pyqt_src_dir + '/uic'),
-                        QDir.toNativeSeparators(pyqt_dst_dir + '/uic'),
-                        copy_function=copy_freeze)
+        return resource_contents
 
-        # Write the .qrc files.
-        if nr_resources == 1:
-            resource_names = [self._write_resource(resources_dir,
-                    resource_contents)]
+    def _handle_unreachable(self, resource_contents, jobs, metadata, required_modules, exclude):
+        """ Report, and optionally exclude, the frozen modules of a resource
+        that cannot be reached by the imports made by the application.  Return
+        the (possibly updated) resource contents.
+        """
+
+        project = self._project
+
+        self._message_handler.progress_message(
+                "Analysing the imports of the application")
+
+        analyser = ImportAnalyser(project.python_target_version[0])
+
+        # Add the frozen modules.
+        frozen = {}
+
+        for job in jobs:
+            out_file, in_file, name, conversion = job
+
+            if conversion != 'data':
+                continue
+
+            # Convert the resource path to a module name.
+            module_name = name[2:-3]
+
+            if module_name.endswith('/__init__'):
+                module_name = module_name[:-9]
+
+            module_name = module_name.replace('/', '.')
+
+            analyser.add_module(module_name, in_file)
+            frozen[module_name] = job
+
+        # Add the extension modules.  Any Python modules they import are
+        # specified by the meta-data.
+        for name in required_modules.keys():
+            module = metadata[name]
+
+            if module.source is not None:
+                analyser.add_module(name, dependencies=module.deps)
+
+        # The roots are the application itself, any core modules, any
+        # dependencies hidden from the user and anything that is imported
+        # dynamically.  We never exclude any part of PyQt.
+        protected = ['PyQt4', 'PyQt4.*', 'PyQt5', 'PyQt5.*', 'encodings.*']
+
+        for name in required_modules.keys():
+            module = metadata[name]
+
+            if module.core or '*' in name:
+                protected.append(name)
+
+            protected.extend(module.hidden_deps)
+
+        roots = [name for name in frozen.keys()
+                if any([fnmatch.fnmatchcase(name, p) for p in protected])]
+
+        roots.extend([name for name in required_modules.keys()
+                if metadata[name].core])
+
+        root_files = []
+
+        if project.application_script != '':
+            root_files.append(
+                    project.path_from_user(project.application_script))
         else:
-            resource_names = []
+            roots.append(project.application_entry_point.split(':')[0])
+
+        reachable = analyser.get_reachable(roots, root_files)
+
+        for name in analyser.unparseable:
+            self._message_handler.progress_message(
+                    "Unable to analyse the imports of {0}".format(name))
+
+        unreachable = sorted(set(frozen.keys()) - reachable)
+
+        for name in unreachable:
+            self._message_handler.progress_message(
+                    "{0} is included but is not imported".format(name))
+
+        if not exclude or not unreachable:
+            return resource_contents
+
+        if analyser.unparseable:
+            raise UserException(
+                    "Unreachable modules cannot be excluded because the "
+                    "imports of some modules could not be analysed")
+
+        excluded = set()
+
+        for name in unreachable:
+            job = frozen[name]
+            jobs.remove(job)
+            excluded.add(job[2][2:] + 'o')
+
+        return [c for c in resource_contents if c not in excluded]
+
+    # The estimated cost, in equivalent bytes, of handling a file in a
+    # resource over and above the cost of its contents.
+    _resource_file_overhead = 512
 
-            nr_files = len(resource_contents)
+    # The minimum estimated cost of a resource when the number of resources is
+    # chosen automatically.
+    _resource_auto_cost = 1024 * 1024
 
-            if nr_resources > nr_files:
-                nr_resources = nr_files
+    def _split_deferred(self, resource_contents, startup_modules, metadata, required_modules):
+        """ Split the contents of a resource into those needed when the
+        application starts and those whose loading can be deferred.  Return
+        a 2-tuple of the startup contents and the deferred contents.
+        """
+
+        startup = set()
+
+        try:
+            with open(startup_modules) as f:
+                for line in f:
+                    # Allow a list of names (one per line) or the CSV written
+                    # when recording import statistics.
+                    name = line.split(',')[0].strip()
+
+                    if name and not name.startswith('#') and name != 'module':
+                        startup.add(name)
+        except OSError as e:
+            raise UserException(
+                    "Unable to read {0}".format(startup_modules), str(e))
+
+        # Core modules and any hidden dependencies are needed before the
+        # application is running.
+        for name in required_modules.keys():
+            module = metadata[name]
+
+            if module.core:
+                startup.add(name)
+
+            startup.update(module.hidden_deps)
+
+        # Any parent packages will have been imported.
+        for name in list(startup):
+            parts = name.split('.')
+
+            for i in range(1, len(parts)):
+                startup.add('.'.join(parts[:i]))
+
+        startup_contents = []
+        deferred_contents = []
+
+        for content in resource_contents:
+            if content.endswith('.pyo'):
+                names = self._get_module_names(content)
 
-            per_resource = (nr_files + nr_resources - 1) // nr_resources
-            start = 0
+                if startup.isdisjoint(names):
+                    deferred_contents.append(content)
+                    continue
 
-            for r in range(nr_resources):
-                end = start + per_resource
-                if end > nr_files:
-                    end = nr_files
+            startup_contents.append(content)
 
-                resource_names.append(
-                        self._write_resource(resources_dir,
-                                resource_contents[start:end], r))
-                start += per_resource
+        self._message_handler.progress_message(
+                "Deferring the loading of {0} modules".format(
+                        len(deferred_contents)))
 
-        return resource_names
+        return startup_contents, deferred_contents
 
-    def _write_resource(self, resources_dir, resource_contents, nr=-1):
+    def _get_module_names(self, content):
+        """ Return the names by which a frozen module in a resource may be
+        imported allowing for any resource directories on sys.path.
+        """
+
+        index_name = self._get_index_name(content)
+        names = [index_name.replace('/', '.')]
+
+        for dir_name in shlex.split(self._project.sys_path):
+            # Only resource directories can contain frozen modules.
+            if not dir_name.startswith(':'):
+                continue
+
+            dir_name = posixpath.normpath(dir_name[1:].lstrip('/'))
+            if dir_name == '.':
+                continue
+
+            prefix = dir_name + '/'
+
+            if index_name.startswith(prefix):
+                names.append(index_name[len(prefix):].replace('/', '.'))
+
+        return names
+
+    def _write_resources(self, resources_dir, resource_contents, nr_resources):
+        """ Write the .qrc files and return their basenames. """
+
+        partitions = self._partition_resources(resources_dir,
+                resource_contents, nr_resources)
+
+        if len(partitions) == 1:
+            return [self._write_resource(resources_dir, partitions[0])]
+
+        return [self._write_resource(resources_dir, contents, r)
+                for r, contents in enumerate(partitions)]
+
+    def _partition_resources(self, resources_dir, resource_contents, nr_resources):
+        """ Partition the contents of a resource and return the list of
+        partitions.  The files are distributed between the partitions so that
+        the estimated cost of compiling each one is roughly the same.
+        """
+
+        costs = {}
+        for content in resource_contents:
+            costs[content] = self._resource_file_overhead + os.path.getsize(
+                    QDir.toNativeSeparators(resources_dir + '/' + content))
+
+        if nr_resources == 0:
+            nr_resources = min(multiprocessing.cpu_count(),
+                    sum(costs.values()) // self._resource_auto_cost)
+
+        nr_resources = max(1, min(nr_resources, len(resource_contents)))
+
+        if nr_resources == 1:
+            return [resource_contents]
+
+        # Place the most costly files first, each in the resource with the
+        # lowest total cost so far.  The resource number breaks ties so that
+        # the output is reproduceable.
+        bins = [(0, r, []) for r in range(nr_resources)]
+
+        for content in sorted(resource_contents,
+                key=lambda c: (-costs[c], c)):
+            cost, r, contents = heapq.heappop(bins)
+            contents.append(content)
+            heapq.heappush(bins, (cost + costs[content], r, contents))
+
+        self._message_handler.verbose_message(
+                "Estimated resource costs: {0}".format(
+                        ', '.join([str(b[0]) for b in sorted(bins,
+                                key=lambda b: b[1])])))
+
+        # Preserve the original order within each resource.
+        order = {content: i for i, content in enumerate(resource_contents)}
+
+        partitions = []
+
+        for _, r, contents in sorted(bins, key=lambda b: b[1]):
+            contents.sort(key=lambda c: order[c])
+            partitions.append(contents)
+
+        return partitions
+
+    def _write_resource(self, resources_dir, resource_contents, nr=-1, prefix='pyqtdeploy'):
         """ Write a single resource file and return its basename. """
 
         suffix = '' if nr < 0 else str(nr)
-        basename = 'pyqtdeploy{0}.qrc'.format(suffix)
+        basename = '{0}{1}.qrc'.format(prefix, suffix)
 
         f = self._create_file(resources_dir + '/' + basename)
 
@@ -339,7 +739,16 @@ class Builder:
 ''')
 
         for content in resource_contents:
-            f.write('        <file>{0}</file>\n'.format(content))
+            # A pattern may match individual files in a directory.
+            if self._no_compress:
+                file_names = self._get_resource_files(resources_dir, content)
+            else:
+                file_names = [content]
+
+            for file_name in file_names:
+                f.write('        <file{0}>{1}</file>\n'.format(
+                        self._get_compression_attributes(file_name),
+                        file_name))
 
         f.write('''    </qresource>
 </RCC>
@@ -347,9 +756,305 @@ class Builder:
 
         f.close()
 
+        if self._message_handler.verbose:
+            self._report_compression(resources_dir, basename,
+                    resource_contents)
+
         return basename
 
-    def _write_stdlib_py(self, resource_contents, resources_dir, required_py, standard_library_dir, job_writer):
+    # The compression level and threshold used by rcc by default.
+    _rcc_compress_level = -1
+    _rcc_compress_threshold = 70
+
+    def _get_compression_attributes(self, file_name):
+        """ Return the attributes of a file in a .qrc file that implement the
+        compression policy.
+        """
+
+        # A threshold of 100% means the file is never compressed.
+        if not self._is_compressible(file_name):
+            return ' threshold="100"'
+
+        attributes = ''
+
+        if self._compress_level is not None:
+            attributes += ' compress="{0}"'.format(self._compress_level)
+
+        if self._compress_threshold is not None:
+            attributes += ' threshold="{0}"'.format(self._compress_threshold)
+
+        return attributes
+
+    def _is_compressible(self, file_name):
+        """ Return True if a file in a resource may be compressed. """
+
+        # Make sure the archive is never compressed so that it can be used
+        # directly from memory.
+        if file_name == self._archive_name:
+            return False
+
+        if self._compress_level == 0:
+            return False
+
+        names = [file_name]
+
+        if file_name.endswith('.pyo'):
+            parts = self._get_index_name(file_name).split('/')
+            names.extend(['.'.join(parts[:i + 1]) for i in range(len(parts))])
+
+        for pattern in self._no_compress:
+            for name in names:
+                if fnmatch.fnmatchcase(name, pattern):
+                    return False
+
+        return True
+
+    @staticmethod
+    def _get_resource_files(resources_dir, content):
+        """ Return the sorted list of the resource paths of the files
+        corresponding to an item of a resource's contents.
+        """
+
+        path = resources_dir + '/' + content
+
+        if not os.path.isdir(path):
+            return [content]
+
+        file_names = []
+
+        for dir_path, _, names in os.walk(path):
+            rel_dir = os.path.relpath(dir_path, resources_dir).replace(os.sep,
+                    '/')
+
+            for name in names:
+                file_names.append(rel_dir + '/' + name)
+
+        return sorted(file_names)
+
+    def _report_compression(self, resources_dir, basename, resource_contents):
+        """ Report the size of a resource before and after compression by
+        rcc and an estimate of the time taken to decompress it.  The estimate
+        is based on the time taken on the host.
+        """
+
+        level = self._compress_level
+        if level is None:
+            level = self._rcc_compress_level
+
+        threshold = self._compress_threshold
+        if threshold is None:
+            threshold = self._rcc_compress_threshold
+
+        nr_files = nr_compressed = raw_size = stored_size = 0
+        decompress_time = 0.0
+
+        for content in resource_contents:
+            for file_name in self._get_resource_files(resources_dir, content):
+                with open(resources_dir + '/' + file_name, 'rb') as f:
+                    data = f.read()
+
+                nr_files += 1
+                raw_size += len(data)
+
+                if data and self._is_compressible(file_name):
+                    # This mimics qCompress() which prepends the size of the
+                    # uncompressed data.
+                    compressed = zlib.compress(data, level)
+                    size = 4 + len(compressed)
+
+                    if int(100.0 * (len(data) - size) / len(data)) >= threshold:
+                        start = time.time()
+                        zlib.decompress(compressed)
+                        decompress_time += time.time() - start
+
+                        nr_compressed += 1
+                        stored_size += size
+                        continue
+
+                stored_size += len(data)
+
+        self._message_handler.verbose_message(
+                "{0}: {1} files ({2} compressed), {3} bytes raw, {4} bytes "
+                "stored, estimated decompression time {5:.1f}ms".format(
+                        basename, nr_files, nr_compressed, raw_size,
+                        stored_size, decompress_time * 1000))
+
+    # The types of an entry in the module index.  These must be the same as
+    # those used by pdytools.
+    _index_module = 0
+    _index_package = 1
+    _index_namespace = 2
+
+    # The names of the module index types as used by pdytools.
+    _index_type_names = ('IndexModule', 'IndexPackage', 'IndexNamespace')
+
+    def _get_module_index(self, resource_contents):
+        """ Return a dict of the type of every module, package and namespace in
+        a resource keyed by its resource path without any '.pyo' or
+        '/__init__.pyo' suffix.
+        """
+
+        index = {}
+
+        for content in resource_contents:
+            parts = content.split('/')
+            name = parts.pop()
+
+            if name.endswith('.pyo'):
+                name = name[:-4]
+
+                if name == '__init__':
+                    entry_type = self._index_package
+                else:
+                    parts.append(name)
+                    entry_type = self._index_module
+
+                if parts:
+                    self._add_index_entry(index, parts, entry_type)
+                    del parts[-1]
+
+            # Any directory that isn't a package is a namespace.
+            for i in range(len(parts)):
+                self._add_index_entry(index, parts[:i + 1],
+                        self._index_namespace)
+
+        return index
+
+    @staticmethod
+    def _add_index_entry(index, parts, entry_type):
+        """ Add an entry to a module index unless there is already one that
+        would be found first by the importer.
+        """
+
+        name = '/'.join(parts)
+
+        # Note that the order of the types is significant.
+        if name not in index or index[name] > entry_type:
+            index[name] = entry_type
+
+    @staticmethod
+    def _get_index_name(content):
+        """ Return the name in the module index of a frozen module in a
+        resource.
+        """
+
+        name = content[:-4]
+
+        if name.endswith('/__init__'):
+            name = name[:-9]
+
+        return name
+
+    def _write_module_index(self, module_index, bundles):
+        """ Write the header file containing the module index used by the
+        qrcimporter.  bundles is a dict of the number of the deferred bundle
+        containing a module keyed by its name in the index.
+        """
+
+        f = self._create_file(self._build_dir + '/pyqtdeploy_modules.h')
+
+        f.write('static const ModuleIndexEntry module_index_entries[] = {\n')
+
+        for name in sorted(module_index.keys()):
+            f.write('    {{"{0}", {1}, {2}}},\n'.format(self._c_string(name),
+                    self._index_type_names[module_index[name]],
+                    bundles.get(name, 0)))
+
+        f.write('    {0, IndexModule, 0}\n};\n')
+
+        f.close()
+
+    @staticmethod
+    def _c_string(s):
+        """ Return a string with any characters that can't appear in a C
+        string literal escaped.
+        """
+
+        escaped = ''
+
+        for b in bytearray(s.encode('UTF-8')):
+            if b in (0x22, 0x5c):
+                escaped += '\\' + chr(b)
+            elif 0x20 <= b < 0x7f:
+                escaped += chr(b)
+            else:
+                escaped += '\\{0:03o}'.format(b)
+
+        return escaped
+
+    # The name of the resource containing the archive of frozen modules.  This
+    # must be the same as the name used by pdytools.
+    _archive_name = 'pyqtdeploy.pda'
+
+    # The values that identify the format of the archive.
+    _archive_magic = b'PDYA'
+    _archive_version = 1
+
+    def _write_archive(self, resources_dir, resource_contents, module_index):
+        """ Pack the frozen modules in a resource into an archive and return
+        the updated resource contents.  The archive starts with a header (a
+        magic number, a format version and the number of entries) followed by
+        a table of entries sorted by the UTF-8 encoded name.  The name of an
+        entry is the same as its name in the module index.  Each entry is the
+        offset and size of the name, the offset and size of the marshalled
+        code and the type of the entry.  All values are 32 bit little-endian
+        unsigned integers and all offsets are from the start of the archive.
+        The table of entries is followed by the names which are followed by
+        the code.
+        """
+
+        self._message_handler.progress_message("Packing the frozen modules")
+
+        entries = []
+
+        for name, entry_type in module_index.items():
+            if entry_type == self._index_module:
+                content = name + '.pyo'
+            elif entry_type == self._index_package:
+                content = name + '/__init__.pyo'
+            else:
+                continue
+
+            with open(QDir.toNativeSeparators(resources_dir + '/' + content), 'rb') as f:
+                code = f.read()
+
+            entries.append((name.encode('UTF-8'), entry_type, code))
+
+        entries.sort()
+
+        header_size = 3 * 4
+        entry_size = 5 * 4
+
+        names_offset = header_size + len(entries) * entry_size
+        code_offset = names_offset + sum([len(e[0]) for e in entries])
+
+        table = [struct.pack('<4sII', self._archive_magic,
+                self._archive_version, len(entries))]
+        names = []
+        code_blob = []
+
+        for name, entry_type, code in entries:
+            table.append(
+                    struct.pack('<5I', names_offset, len(name), code_offset,
+                            len(code), entry_type))
+
+            names_offset += len(name)
+            code_offset += len(code)
+            names.append(name)
+            code_blob.append(code)
+
+        archive_name = resources_dir + '/' + self._archive_name
+        self._add_output(archive_name)
+        self._update_file(archive_name,
+                b''.join(table + names + code_blob))
+
+        resource_contents = [c for c in resource_contents
+                if not c.endswith('.pyo')]
+        resource_contents.append(self._archive_name)
+
+        return resource_contents
+
+    def _write_stdlib_py(self, resource_contents, resources_dir, required_py, standard_library_dir, jobs):
         """ Write the required parts of the Python standard library that are
         implemented in Python.
         """
@@ -381,7 +1086,7 @@ class Builder:
             in_file = name_path + suffix
             out_file = in_file + 'o'
 
-            self._freeze(job_writer, resources_dir + '/' + out_file,
+            self._freeze(jobs, resources_dir + '/' + out_file,
                     standard_library_dir + '/' + in_file, in_file)
 
             resource_contents.append(out_file)
@@ -396,7 +1101,7 @@ class Builder:
         ('.y',      'YACCSOURCES')
     )
 
-    def _write_qmake(self, py_version, required_ext, required_libraries, include_dir, python_library, standard_library_dir, source_dir, job_writer, opt, resource_names):
+    def _write_qmake(self, py_version, required_ext, required_libraries, include_dir, python_library, standard_library_dir, source_dir, jobs, opt, resource_names, import_stats, external_resources, deferred_names, cython_sources):
         """ Create the .pro file for qmake. """
 
         project = self._project
@@ -550,6 +1255,11 @@ class Builder:
                 self._add_compound_scoped_values(used_libs, other_em.libs,
                         False)
 
+        # Handle any modules compiled with Cython.
+        for name, source in cython_sources.items():
+            used_inittab.add(name)
+            used_sources.add(source)
+
         # Configure the target Python interpreter.
         if include_dir != '':
             used_includepath.add(include_dir)
@@ -594,6 +1304,30 @@ class Builder:
 
             used_inittab.add(name)
 
+            if module.libs is not None:
+                for lib in module.libs:
+                    lib = self._get_scoped_value(lib)
+                    if lib is not None:
+                        used_libs.add(lib)
+
+            if module.pyd is not None and target_platform == 'win':
+                used_dlls.add(module)
+
+            # Use any static library of the module built in the sysroot rather
+            # than compile the module's sources.
+            if py_lib_dir is not None:
+                ext_lib_dir, ext_lib = self._find_extension_library(name,
+                        module, py_lib_dir)
+
+                if ext_lib is not None:
+                    self._message_handler.verbose_message(
+                            "Using the static library {0} for {1}".format(
+                                    ext_lib, name))
+
+                    used_libs.add('-L' + ext_lib_dir)
+                    used_libs.add('-l' + ext_lib)
+                    continue
+
             for source in module.source:
                 source = self._get_scoped_value(source)
                 if source is not None:
@@ -616,15 +1350,6 @@ class Builder:
                                 includepath)
                         used_includepath.add(includepath)
 
-            if module.libs is not None:
-                for lib in module.libs:
-                    lib = self._get_scoped_value(lib)
-                    if lib is not None:
-                        used_libs.add(lib)
-
-            if module.pyd is not None and target_platform == 'win':
-                used_dlls.add(module)
-
         if 'win' not in project.python_use_platform and target_platform == 'win':
             used_includepath.add(source_dir + '/PC')
 
@@ -683,13 +1408,22 @@ class Builder:
 
         # Specify the resource files.
         f.write('\n')
-        f.write('RESOURCES = \\\n')
-        f.write(' \\\n'.join(['    resources/{0}'.format(n) for n in resource_names]))
-        f.write('\n')
+
+        if external_resources:
+            self._write_external_resources(f, resource_names, deferred_names)
+        else:
+            f.write('RESOURCES = \\\n')
+            f.write(' \\\n'.join(['    resources/{0}'.format(n) for n in resource_names]))
+            f.write('\n')
+
+            if deferred_names:
+                f.write('\n')
+                self._write_external_resources(f, [], deferred_names)
 
         # Specify the defines.
         defines = []
-        headers = ['pyqtdeploy_version.h', 'frozen_bootstrap.h']
+        headers = ['pyqtdeploy_version.h', 'pyqtdeploy_modules.h',
+                'frozen_bootstrap.h']
 
         if py_version >= 0x030500:
             headers.append('frozen_bootstrap_external.h')
@@ -701,6 +1435,24 @@ class Builder:
         if opt:
             defines.append('PYQTDEPLOY_OPTIMIZED')
 
+        if import_stats:
+            defines.append('PYQTDEPLOY_IMPORT_STATS')
+
+        if project.application_fast_exit:
+            defines.append('PYQTDEPLOY_FAST_EXIT')
+
+            if project.application_run_atexit:
+                defines.append('PYQTDEPLOY_RUN_ATEXIT')
+
+        if external_resources:
+            defines.append('PYQTDEPLOY_EXTERNAL_RESOURCES')
+
+        if deferred_names:
+            defines.append('PYQTDEPLOY_DEFERRED_RESOURCES')
+
+        if external_resources or deferred_names:
+            headers.append('pyqtdeploy_resources.h')
+
         if defines or used_defines:
             f.write('\n')
 
@@ -752,6 +1504,386 @@ class Builder:
         # All done.
         f.close()
 
+    # The name of the Makefile generated by qmake to determine the compiler and
+    # linker flags used by build.ninja.
+    _ninja_makefile_name = 'Makefile.ninja'
+
+    # The file extensions of the sources that can be compiled by build.ninja
+    # and the corresponding rule.
+    _ninja_compilers = (
+        ('.c',      'cc'),
+        ('.cc',     'cxx'),
+        ('.cpp',    'cxx'),
+        ('.cxx',    'cxx'),
+    )
+
+    def _write_ninja(self, qmake, resources_dir, resource_names, binary_names):
+        """ Create the build.ninja file.  It is generated from the data in
+        the Makefile created by qmake (which knows about the target's tool
+        chain and the Qt libraries) but builds everything itself, tracking the
+        dependencies of each source with depfiles and those of each resource
+        file with its contents.  Resource files in binary_names are compiled
+        to binary .rcc files.
+        """
+
+        project = self._project
+
+        if self._target.platform.name == 'macos':
+            if project.application_is_bundle:
+                raise UserException(
+                        "Ninja does not support macOS application bundles")
+
+        # Get the compiler and linker flags from qmake.
+        self.run([qmake, '-o', self._ninja_makefile_name,
+                        project.get_executable_basename() + '.pro'],
+                "Unable to run qmake", in_build_dir=True)
+
+        makefile_name = self._build_dir + '/' + self._ninja_makefile_name
+        self._add_output(makefile_name)
+        makefile = self._read_makefile_variables(makefile_name)
+
+        def expand(name):
+            return self._expand_makefile_variable(makefile, name)
+
+        rcc = self._run_qmake_query(qmake, 'QT_HOST_BINS') + '/rcc'
+
+        variables = [expand(name) for name in ('CC', 'CXX', 'CFLAGS',
+                'CXXFLAGS', 'INCPATH', 'LINK', 'LFLAGS', 'LIBS')]
+        variables.append(rcc)
+
+        f = self._create_file(self._build_dir + '/build.ninja')
+
+        f.write('''# Generated by pyqtdeploy-build.  The compiler and linker flags are those
+# determined by qmake.
+
+ninja_required_version = 1.3
+
+cc = {0}
+cxx = {1}
+cflags = {2}
+cxxflags = {3}
+incpath = {4}
+link = {5}
+lflags = {6}
+libs = {7}
+rcc = {8}
+
+rule cc
+  command = $cc -c $cflags $incpath -MD -MF $out.d -o $out $in
+  depfile = $out.d
+  deps = gcc
+  description = Compiling $in
+
+rule cxx
+  command = $cxx -c $cxxflags $incpath -MD -MF $out.d -o $out $in
+  depfile = $out.d
+  deps = gcc
+  description = Compiling $in
+
+rule rcc
+  command = $rcc -name $name $in -o $out
+  description = Compiling $in
+
+rule rcc_binary
+  command = $rcc -binary $in -o $out
+  description = Compiling $in
+
+rule link
+  command = $link $lflags -o $out $in $libs
+  description = Linking $out
+
+'''.format(*[self._ninja_escape(v, is_path=False) for v in variables]))
+
+        # The resources.  Note that we don't use the qrc_*.cpp files that
+        # qmake would generate.
+        sources = [src for src in expand('SOURCES').split()
+                if not os.path.basename(src).startswith('qrc_')]
+
+        defaults = []
+
+        for resource_name in resource_names:
+            resource_base = resource_name[:-len('.qrc')]
+            resource_path = 'resources/' + resource_name
+            dependencies = ' $\n    '.join(
+                    [self._ninja_escape('resources/' + file_name)
+                            for file_name in self._read_qrc_files(
+                                    resources_dir, resource_name)])
+
+            if resource_name in binary_names:
+                output = resource_base + '.rcc'
+                f.write('build {0}: rcc_binary {1} | {2}\n'.format(
+                        self._ninja_escape(output),
+                        self._ninja_escape(resource_path), dependencies))
+                defaults.append(output)
+            else:
+                output = 'qrc_' + resource_base + '.cpp'
+                f.write('build {0}: rcc {1} | {2}\n'.format(
+                        self._ninja_escape(output),
+                        self._ninja_escape(resource_path), dependencies))
+                f.write('  name = {0}\n'.format(resource_base))
+                sources.append(output)
+
+        f.write('\n')
+
+        # The sources.
+        objects = []
+        object_names = set()
+
+        for source in sources:
+            base, ext = os.path.splitext(source)
+
+            for compiler_ext, rule in self._ninja_compilers:
+                if ext == compiler_ext:
+                    break
+            else:
+                raise UserException(
+                        "{0} cannot be compiled by Ninja".format(source))
+
+            # Make sure the object names are unique.
+            base = os.path.basename(base)
+            obj = '.ninja_obj/{0}.o'.format(base)
+            nr = 0
+            while obj in object_names:
+                nr += 1
+                obj = '.ninja_obj/{0}_{1}.o'.format(base, nr)
+
+            object_names.add(obj)
+            objects.append(obj)
+
+            f.write('build {0}: {1} {2}\n'.format(self._ninja_escape(obj),
+                    rule, self._ninja_escape(source)))
+
+        # The executable.
+        target = expand('TARGET')
+        defaults.insert(0, target)
+
+        f.write('\nbuild {0}: link {1}\n'.format(self._ninja_escape(target),
+                ' '.join([self._ninja_escape(o) for o in objects])))
+
+        f.write('\ndefault {0}\n'.format(
+                ' '.join([self._ninja_escape(d) for d in defaults])))
+
+        f.close()
+
+        return objects
+
+    def _get_qmake(self, qmake):
+        """ Return the name of the qmake executable to use. """
+
+        if qmake:
+            return qmake
+
+        # Use the qmake left by pyqtdeploy-sysroot if there is one.
+        qmake = os.path.join(os.environ['SYSROOT'], 'host', 'bin',
+                self._host.platform.exe('qmake'))
+
+        if os.path.isfile(qmake):
+            return qmake
+
+        return 'qmake'
+
+    def _make(self, qmake, nr_jobs, timings):
+        """ Build the application by running qmake and then make nr_jobs at
+        a time.  The objects are compiled before the application is linked so
+        that the time taken by each can be reported.
+        """
+
+        start_time = time.time()
+        self.run([qmake, self._project.get_executable_basename() + '.pro'],
+                "Unable to run qmake", in_build_dir=True)
+        timings.append(("qmake", time.time() - start_time))
+
+        # Use jom, if available, rather than nmake as it supports parallel
+        # builds.
+        make = self._host.platform.make
+
+        if make == 'nmake' and shutil.which('jom'):
+            make = 'jom'
+
+        argv = [make]
+
+        if make == 'jom':
+            argv.append('/J')
+            argv.append(str(nr_jobs))
+        elif make != 'nmake':
+            argv.append('-j')
+            argv.append(str(nr_jobs))
+
+        # On Windows qmake creates a Makefile that invokes a Makefile for each
+        # configuration.  We build the release configuration directly.
+        makefile_name = 'Makefile'
+
+        if os.path.isfile(self._build_dir + '/Makefile.Release'):
+            makefile_name = 'Makefile.Release'
+            argv.append('-f')
+            argv.append(makefile_name)
+
+        makefile = self._read_makefile_variables(
+                self._build_dir + '/' + makefile_name)
+        objects = self._expand_makefile_variable(makefile, 'OBJECTS').split()
+
+        if objects:
+            start_time = time.time()
+            self.run(argv + objects, "Unable to compile the application",
+                    in_build_dir=True, merge_output=True)
+            timings.append(("compiling", time.time() - start_time))
+
+        start_time = time.time()
+        self.run(argv, "Unable to build the application", in_build_dir=True,
+                merge_output=True)
+        timings.append(("linking", time.time() - start_time))
+
+    def _make_ninja(self, objects, nr_jobs, timings):
+        """ Build the application by running ninja nr_jobs at a time.  The
+        objects are compiled before the application is linked so that the time
+        taken by each can be reported.
+        """
+
+        argv = ['ninja', '-j', str(nr_jobs)]
+
+        start_time = time.time()
+        self.run(argv + objects, "Unable to compile the application",
+                in_build_dir=True, merge_output=True)
+        timings.append(("compiling", time.time() - start_time))
+
+        start_time = time.time()
+        self.run(argv, "Unable to build the application", in_build_dir=True,
+                merge_output=True)
+        timings.append(("linking", time.time() - start_time))
+
+    @classmethod
+    def _expand_makefile_variable(cls, variables, name):
+        """ Return the value of a Makefile variable with any references to
+        other variables expanded.
+        """
+
+        value = variables.get(name, '')
+
+        while '$(' in value:
+            start = value.index('$(')
+            end = value.index(')', start)
+            ref = cls._expand_makefile_variable(variables,
+                    value[start + 2:end])
+            value = value[:start] + ref + value[end + 1:]
+
+        return value
+
+    @staticmethod
+    def _ninja_escape(value, is_path=True):
+        """ Return a value escaped for use in a build.ninja file. """
+
+        value = value.replace('$', '$$')
+
+        if is_path:
+            value = value.replace(' ', '$ ').replace(':', '$:')
+
+        return value
+
+    @staticmethod
+    def _read_makefile_variables(makefile_name):
+        """ Return a dict of the variables defined at the start of a Makefile
+        generated by qmake.
+        """
+
+        variables = {}
+
+        try:
+            with open(makefile_name) as makefile:
+                logical_line = ''
+
+                for line in makefile:
+                    line = line.rstrip('\n')
+
+                    if line.endswith('\\'):
+                        logical_line += line[:-1] + ' '
+                        continue
+
+                    logical_line += line
+
+                    name, sep, value = logical_line.partition('=')
+                    name = name.strip()
+
+                    if sep and name.isidentifier():
+                        variables[name] = ' '.join(value.split())
+
+                    logical_line = ''
+        except Exception as e:
+            raise UserException("Unable to read {0}".format(makefile_name),
+                    str(e))
+
+        return variables
+
+    def _read_qrc_files(self, resources_dir, resource_name):
+        """ Return the list of the files in a .qrc file relative to the
+        resources directory.
+        """
+
+        qrc_name = resources_dir + '/' + resource_name
+
+        try:
+            with open(qrc_name) as qrc:
+                contents = re.findall(r'<file[^>]*>([^<]+)</file>', qrc.read())
+        except Exception as e:
+            raise UserException("Unable to read {0}".format(qrc_name), str(e))
+
+        file_names = []
+
+        for content in contents:
+            file_names.extend(
+                    self._get_resource_files(resources_dir, content))
+
+        return file_names
+
+    def _run_qmake_query(self, qmake, name):
+        """ Return the value of a qmake property. """
+
+        try:
+            value = subprocess.check_output([qmake, '-query', name],
+                    universal_newlines=True)
+        except Exception as e:
+            raise UserException(
+                    "Unable to get the value of {0} from qmake".format(name),
+                    str(e))
+
+        return value.strip()
+
+    def _write_external_resources(self, f, resource_names, deferred_names):
+        """ Write the qmake commands to compile the resources (those
+        registered when the application starts and those registered when first
+        needed) to binary .rcc files and the header file containing their
+        names.
+        """
+
+        f.write('PDY_RCC_RESOURCES = \\\n')
+        f.write(' \\\n'.join(['    resources/{0}'.format(n) for n in resource_names + deferred_names]))
+        f.write('\n')
+
+        f.write('''
+pdy_rcc.name = Binary resource compiler
+pdy_rcc.input = PDY_RCC_RESOURCES
+pdy_rcc.output = ${QMAKE_FILE_BASE}.rcc
+pdy_rcc.commands = $$shell_path($$[QT_HOST_BINS]/rcc) -binary ${QMAKE_FILE_IN} -o ${QMAKE_FILE_OUT}
+pdy_rcc.depend_command = $$shell_path($$[QT_HOST_BINS]/rcc) -list ${QMAKE_FILE_IN}
+pdy_rcc.CONFIG += no_link target_predeps
+QMAKE_EXTRA_COMPILERS += pdy_rcc
+''')
+
+        rf = self._create_file(self._build_dir + '/pyqtdeploy_resources.h')
+
+        arrays = (('external_resources', resource_names),
+                ('deferred_resources', deferred_names))
+
+        for array, names in arrays:
+            rf.write('static const char *{0}[] = {{\n'.format(array))
+
+            for name in names:
+                rf.write('    "{0}",\n'.format(
+                        self._c_string(name[:-len('.qrc')] + '.rcc')))
+
+            rf.write('    0\n};\n')
+
+        rf.close()
+
     @classmethod
     def _write_qt_config(cls, f, name, qt_major, values):
         """ Write the values of QT or CONFIG which may be Qt version specific.
@@ -773,6 +1905,55 @@ class Builder:
             if indent:
                 f.write('}\n')
 
+    def _find_extension_library(self, name, module, py_lib_dir):
+        """ Return a 2-tuple of the directory and name of the static library
+        of a standard library extension module built in the sysroot.  The name
+        will be None if there is no library built with the configuration that
+        the module would be compiled with.
+        """
+
+        ext_lib_dir = get_extension_library_dir(py_lib_dir,
+                self._project.python_target_version)
+
+        if module.xlib is None:
+            xlib_configuration = None
+        else:
+            xlib_configuration = self._get_xlib_configuration(module.xlib)
+
+        ext_lib = get_extension_library_name(name, self._target,
+                get_extension_module_configuration(module, self._target),
+                xlib_configuration)
+
+        if self._target.platform.name == 'win':
+            lib_file = ext_lib + '.lib'
+        else:
+            lib_file = 'lib' + ext_lib + '.a'
+
+        if not os.path.isfile(os.path.join(ext_lib_dir, lib_file)):
+            ext_lib = None
+
+        return ext_lib_dir, ext_lib
+
+    def _get_xlib_configuration(self, xlib_name):
+        """ Return a 2-tuple of the (unexpanded) DEFINES and INCLUDEPATH of
+        an external library.
+        """
+
+        project = self._project
+        target_platform = self._target.platform.name
+
+        for xlib in project.external_libraries.get(target_platform, ()):
+            if xlib.name == xlib_name:
+                return (xlib.defines, xlib.includepath)
+
+        # Use the defaults.
+        if target_platform not in project.python_use_platform:
+            for xlib in external_libraries_metadata:
+                if xlib.name == xlib_name:
+                    return (xlib.defines, xlib.includepath)
+
+        return ('', '')
+
     @classmethod
     def _write_used_values(cls, f, used_values, name):
         """ Write a set of used values to a .pro file. """
@@ -921,57 +2102,13 @@ exists($$PDY_DLL) {
         value isn't valid for the target.
         """
 
-        parts = scoped_value.split('#', maxsplit=1)
-        if len(parts) == 2:
-            scope, value = parts
-
-            if not self._is_targeted(scope):
-                value = None
-        else:
-            # The value is unscoped.
-            value = scoped_value
-
-        return value
+        return self._target.get_scoped_value(scoped_value)
 
     def _is_targeted(self, targets):
         """ Returns True if the current target is covered by a set of targets.
-        If the set of targets has a False value then the current target is
-        covered.  If the set of targets is a sequence of platform names then
-        the current target platform must appear in the sequence.  If the set of
-        targets is a string then it is an expression of architecture or
-        platform names which must contain the current target architecture or
-        platform name.
         """
 
-        if targets:
-            if isinstance(targets, str):
-                # See if the string is a '|' separated list of targets.
-                targets = targets.split('|')
-                if len(targets) == 1:
-                    # There was no '|' so restore the original string.
-                    targets = targets[0]
-
-            if isinstance(targets, str):
-                # String targets can come from the project file (ie. the user)
-                # and so need to be validated.
-                if targets[0] == '!':
-                    # Note that this assumes that the target is a platform
-                    # rather than an architecture.  If this is incorrect then
-                    # it is a bug in the metadata somewhere.
-                    platform = Platform.platform(targets[1:])
-                    covered = (self._target.platform is not platform)
-                elif '-' in targets:
-                    architecture = Architecture.architecture(targets)
-                    covered = (self._target is architecture)
-                else:
-                    platform = Platform.platform(targets)
-                    covered = (self._target.platform is platform)
-            else:
-                covered = (self._target.platform.name in targets)
-        else:
-            covered = True
-
-        return covered
+        return self._target.is_targeted(targets)
 
     def _get_pyqt_module_metadata(self, module_name):
         """ Get the meta-data for a PyQt module. """
@@ -1006,7 +2143,7 @@ exists($$PDY_DLL) {
             # Handle sub-dependencies.
             self._get_pyqt_module_dependencies(dep, all_modules)
 
-    def _write_package(self, resource_contents, resources_dir, resource, package, src_dir, job_writer):
+    def _write_package(self, resource_contents, resources_dir, resource, package, src_dir, jobs):
         """ Write the contents of a single package and return the list of files
         written relative to the resources directory.
         """
@@ -1019,9 +2156,9 @@ exists($$PDY_DLL) {
             dir_stack = [resource]
 
         self._write_package_contents(package.contents, dst_dir, src_dir,
-                dir_stack, job_writer, resource_contents)
+                dir_stack, jobs, resource_contents)
 
-    def _write_package_contents(self, contents, dst_dir, src_dir, dir_stack, job_writer, resource_contents):
+    def _write_package_contents(self, contents, dst_dir, src_dir, dir_stack, jobs, resource_contents):
         """ Write the contents of a single package directory. """
 
         self._create_directory(dst_dir)
@@ -1035,7 +2172,7 @@ exists($$PDY_DLL) {
 
                 self._write_package_contents(content.contents,
                         dst_dir + '/' + content.name,
-                        src_dir + '/' + content.name, dir_stack, job_writer,
+                        src_dir + '/' + content.name, dir_stack, jobs,
                         resource_contents)
 
                 dir_stack.pop()
@@ -1060,20 +2197,102 @@ exists($$PDY_DLL) {
                 file_path = '/'.join(file_path)
 
                 if freeze_file:
-                    self._freeze(job_writer, dst_path, src_path,
+                    self._freeze(jobs, dst_path, src_path,
                             file_path[:-1])
                 else:
-                    src_path = QDir.toNativeSeparators(src_path)
-                    dst_path = QDir.toNativeSeparators(dst_path)
-
-                    try:
-                        shutil.copyfile(src_path, dst_path)
-                    except FileNotFoundError:
-                        raise UserException(
-                                "{0} does not seem to exist".format(src_path))
+                    self._copy_file(src_path, dst_path)
 
                 resource_contents.append(file_path)
 
+    def _cythonize(self, resource_contents, jobs, temp_dir, cython, py_major):
+        """ Compile the modules specified by the project to C with Cython.
+        The corresponding freeze jobs and resource contents are removed.
+        Return a dict of the names of the C source files (relative to the build
+        directory) keyed by the name of the module.
+        """
+
+        names = self._project.cython_modules.split()
+
+        if not names:
+            return {}
+
+        if not cython:
+            cython = 'cython'
+
+        matched = set()
+        cython_jobs = []
+
+        for job in list(jobs):
+            out_file, in_file, name, conversion = job
+
+            if conversion != 'data':
+                continue
+
+            # The name is the resource path of the .py file.
+            module_path = name[2:-3]
+
+            # Packages (ie. __init__.py) cannot be compiled.
+            if module_path.endswith('/__init__') or module_path == '__init__':
+                continue
+
+            module = module_path.replace('/', '.')
+
+            for cython_name in names:
+                if module == cython_name or module.startswith(
+                        cython_name + '.'):
+                    matched.add(cython_name)
+                    cython_jobs.append((module, in_file))
+
+                    jobs.remove(job)
+                    resource_contents.remove(module_path + '.pyo')
+
+                    break
+
+        for cython_name in names:
+            if cython_name not in matched:
+                raise UserException(
+                        "Unable to find the module {0} to compile with "
+                        "Cython".format(cython_name))
+
+        # Each module's init function is named after the last part of the
+        # module's name so they must be unique.
+        base_names = {}
+
+        for module, _ in cython_jobs:
+            base_name = module.split('.')[-1]
+
+            if base_name in base_names:
+                raise UserException(
+                        "{0} and {1} cannot both be compiled with Cython as "
+                        "their names end with the same name".format(
+                                base_names[base_name], module))
+
+            base_names[base_name] = module
+
+        cython_dir = self._build_dir + '/cython'
+        self._create_directory(cython_dir)
+
+        cython_sources = {}
+
+        for module, in_file in sorted(cython_jobs):
+            self._message_handler.progress_message(
+                    "Compiling {0} with Cython".format(module))
+
+            # Cython always writes the C file so we generate it in the
+            # temporary directory to avoid unnecessary recompilation.
+            temp_c_file = QDir.toNativeSeparators(
+                    temp_dir.path() + '/' + module + '.c')
+
+            self.run([cython, '-{0}'.format(py_major), '-o', temp_c_file,
+                            in_file],
+                    "Unable to compile {0} with Cython".format(in_file))
+
+            c_file = 'cython/' + module + '.c'
+            self._copy_file(temp_c_file, self._build_dir + '/' + c_file)
+            cython_sources[module] = c_file
+
+        return cython_sources
+
     def _write_main(self, py_version, inittab, defines):
         """ Create the application specific pyqtdeploy_main.cpp file. """
 
@@ -1192,8 +2411,7 @@ static struct _inittab %s[] = {
 };
 ''')
 
-    @staticmethod
-    def _freeze(job_writer, out_file, in_file, name, as_c=False):
+    def _freeze(self, jobs, out_file, in_file, name, as_c=False):
         """ Freeze a Python source file to a C header file or a data file. """
 
         out_file = QDir.toNativeSeparators(out_file)
@@ -1205,10 +2423,12 @@ static struct _inittab %s[] = {
             name = ':/' + name
             conversion = 'data'
 
-        job_writer.writerow([out_file, in_file, name, conversion])
+        jobs.append([out_file, in_file, name, conversion])
 
-    def _run_freeze(self, freeze, interpreter, job_filename, opt):
-        """ Run the accumlated freeze jobs. """
+    def _run_freeze(self, freeze, interpreter, job_filename, opt, nr_jobs, cache_dir, cache_size):
+        """ Run the accumlated freeze jobs, nr_jobs at a time, using any
+        cache.
+        """
 
         # On Windows the interpreter name is simply 'python'.  So in order to
         # make the .pdy file more portable we strip any trailing version
@@ -1227,12 +2447,27 @@ static struct _inittab %s[] = {
             argv.append('-O')
 
         argv.append(freeze)
+        argv.append('--jobs')
+        argv.append(str(nr_jobs))
+
+        if cache_dir:
+            argv.append('--cache-dir')
+            argv.append(QDir.toNativeSeparators(os.path.abspath(cache_dir)))
+
+            if cache_size > 0:
+                argv.append('--cache-size')
+                argv.append(str(cache_size))
+
         argv.append(job_filename)
 
         self.run(argv, "Unable to freeze files")
 
-    def run(self, argv, error_message, in_build_dir=False):
-        """ Execute a command and capture the output. """
+    def run(self, argv, error_message, in_build_dir=False, merge_output=False):
+        """ Execute a command and capture the output.  If merge_output is set
+        then stderr is displayed with stdout as it is produced (as is the case
+        with compiler output) and the end of the combined output is used as
+        the detail of any error.
+        """
 
         if in_build_dir:
             saved_cwd = os.getcwd()
@@ -1251,17 +2486,31 @@ static struct _inittab %s[] = {
 
         process = QProcess()
 
-        process.readyReadStandardOutput.connect(
-                lambda: self._message_handler.progress_message(
-                        QTextCodec.codecForLocale().toUnicode(
-                                process.readAllStandardOutput()).strip()))
+        if merge_output:
+            process.setProcessChannelMode(QProcess.MergedChannels)
+
+        # The merged output is kept as well as being displayed as it will not
+        # be seen if progress messages are suppressed.
+        stdout_output = QByteArray()
+
+        def read_stdout():
+            output = process.readAllStandardOutput()
+
+            if merge_output:
+                stdout_output.append(output)
+
+            self._message_handler.progress_message(
+                    QTextCodec.codecForLocale().toUnicode(output).strip())
+
+        process.readyReadStandardOutput.connect(read_stdout)
 
         stderr_output = QByteArray()
         process.readyReadStandardError.connect(
                 lambda: stderr_output.append(process.readAllStandardError()))
 
+        # Note that there is no time limit as a build may take some time.
         process.start(argv[0], argv[1:])
-        finished = process.waitForFinished()
+        finished = process.waitForFinished(-1)
 
         if saved_cwd is not None:
             os.chdir(saved_cwd)
@@ -1272,8 +2521,16 @@ static struct _inittab %s[] = {
             raise UserException(error_message, process.errorString())
 
         if process.exitStatus() != QProcess.NormalExit or process.exitCode() != 0:
-            raise UserException(error_message,
-                    QTextCodec.codecForLocale().toUnicode(stderr_output).strip())
+            if merge_output:
+                # Only the last lines are likely to be relevant.
+                detail = '\n'.join(
+                        QTextCodec.codecForLocale().toUnicode(
+                                stdout_output).strip().splitlines()[-20:])
+            else:
+                detail = QTextCodec.codecForLocale().toUnicode(
+                        stderr_output).strip()
+
+            raise UserException(error_message, detail)
 
     @staticmethod
     def _get_lib_file_name(file_name):
@@ -1281,8 +2538,7 @@ static struct _inittab %s[] = {
 
         return get_embedded_dir(__file__, 'lib').absoluteFilePath(file_name)
 
-    @classmethod
-    def _copy_lib_file(cls, file_name, dir_name, dst_file_name=None):
+    def _copy_lib_file(self, file_name, dir_name, dst_file_name=None):
         """ Copy a library file to a directory and return the full pathname of
         the copy.
         """
@@ -1292,29 +2548,146 @@ static struct _inittab %s[] = {
 
         if dst_file_name is None:
             dst_file_name = file_name
-            s_file_name = cls._get_lib_file_name(file_name)
+            s_file_name = self._get_lib_file_name(file_name)
         else:
             s_file_name = file_name
 
         d_file_name = dir_name + '/' +  dst_file_name
 
-        # Make sure the destination doesn't exist.
-        QFile.remove(d_file_name)
+        s_file = QFile(s_file_name)
+
+        if not s_file.open(QIODevice.ReadOnly):
+            raise UserException("Unable to copy file {0}".format(file_name),
+                    s_file.errorString())
 
-        if not QFile.copy(s_file_name, d_file_name):
-            raise UserException("Unable to copy file {0}".format(file_name))
+        contents = s_file.readAll().data()
+        s_file.close()
 
-        # The file will be read-only if it was embedded.
-        QFile.setPermissions(d_file_name,
-                QFileDevice.ReadOwner|QFileDevice.WriteOwner)
+        self._add_output(d_file_name)
+        self._update_file(d_file_name, contents)
 
         return d_file_name
 
-    @staticmethod
-    def _create_file(file_name):
+    def _copy_file(self, src_file_name, dst_file_name):
+        """ Copy a file to the build directory. """
+
+        src_file_name = QDir.toNativeSeparators(src_file_name)
+
+        try:
+            with open(src_file_name, 'rb') as src_file:
+                contents = src_file.read()
+        except FileNotFoundError:
+            raise UserException(
+                    "{0} does not seem to exist".format(src_file_name))
+        except Exception as e:
+            raise UserException("Unable to read {0}".format(src_file_name),
+                    str(e))
+
+        self._add_output(dst_file_name)
+        self._update_file(dst_file_name, contents)
+
+    def _create_file(self, file_name):
         """ Create a text file in the build directory. """
 
-        return create_file(QDir.toNativeSeparators(file_name))
+        self._add_output(file_name)
+
+        return _OutputFile(self, file_name)
+
+    def _add_output(self, file_name):
+        """ Note that a file has been written to the build directory. """
+
+        file_name = QDir.fromNativeSeparators(file_name)
+        build_dir = QDir.fromNativeSeparators(self._build_dir) + '/'
+
+        if file_name.startswith(build_dir):
+            self._outputs.add(file_name[len(build_dir):])
+
+    @staticmethod
+    def _update_file(file_name, contents):
+        """ Write the contents (a bytes object) of a file but only if they are
+        different from those of any existing file.  This means that the file's
+        timestamp only changes if its contents change so that qmake, rcc and
+        the compiler do not do any unnecessary work.
+        """
+
+        file_name = QDir.toNativeSeparators(file_name)
+
+        try:
+            with open(file_name, 'rb') as old_file:
+                if old_file.read() == contents:
+                    return
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            raise UserException("Unable to read file {0}".format(file_name),
+                    str(e))
+
+        # Write to a temporary file first so that a partial file is never left
+        # behind.
+        temp_name = file_name + '.tmp'
+
+        try:
+            with open(temp_name, 'wb') as new_file:
+                new_file.write(contents)
+
+            os.replace(temp_name, file_name)
+        except Exception as e:
+            raise UserException("Unable to create file {0}".format(file_name),
+                    str(e))
+
+    # The name of the file in the build directory that lists the files written
+    # by the last build.
+    _manifest_name = 'pyqtdeploy.manifest'
+
+    def _update_manifest(self):
+        """ Remove any files written by a previous build that have not been
+        written by this one and save the list of files written by this one.
+        """
+
+        manifest_name = QDir.toNativeSeparators(
+                self._build_dir + '/' + self._manifest_name)
+
+        try:
+            with open(manifest_name, 'rt', encoding='UTF-8') as manifest:
+                old_outputs = set(manifest.read().split('\n'))
+        except FileNotFoundError:
+            old_outputs = set()
+        except Exception as e:
+            raise UserException(
+                    "Unable to read file {0}".format(manifest_name), str(e))
+
+        old_outputs.discard('')
+
+        for stale in sorted(old_outputs - self._outputs, reverse=True):
+            stale_path = QDir.toNativeSeparators(self._build_dir + '/' + stale)
+
+            self._message_handler.verbose_message(
+                    "Removing {0}".format(stale_path))
+
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                raise UserException("Unable to remove {0}".format(stale_path),
+                        str(e))
+
+            # Remove any directories that are now empty.
+            stale_dir = os.path.dirname(stale)
+
+            while stale_dir != '':
+                try:
+                    os.rmdir(QDir.toNativeSeparators(
+                            self._build_dir + '/' + stale_dir))
+                except OSError:
+                    break
+
+                stale_dir = os.path.dirname(stale_dir)
+
+        manifest = _OutputFile(self, manifest_name)
+        manifest.write(''.join(
+                [output + '\n' for output in sorted(self._outputs)]))
+        manifest.close()
 
     def _create_directory(self, dir_name):
         """ Create a directory which may already exist. """
@@ -1330,3 +2703,27 @@ static struct _inittab %s[] = {
             raise UserException(
                     "Unable to create the '{0}' directory".format(dir_name),
                     str(e))
+
+
+class _OutputFile(io.StringIO):
+    """ A text file in the build directory.  The file is only written when it
+    is closed and then only if its contents have changed.
+    """
+
+    def __init__(self, builder, file_name):
+        """ Initialise the object. """
+
+        super().__init__()
+
+        self._builder = builder
+        self._file_name = file_name
+
+    def close(self):
+        """ Close the file and write it if necessary. """
+
+        if not self.closed:
+            contents = self.getvalue().replace('\n', os.linesep)
+            self._builder._update_file(self._file_name,
+                    contents.encode('UTF-8'))
+
+        super().close()
@@ -0,0 +1,181 @@
+# Copyright (c) 2018, Riverbank Computing Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import ast
+
+
+class ImportAnalyser:
+    """ A static analyser of the imports made by a set of Python modules. """
+
+    def __init__(self, py_major):
+        """ Initialise the analyser.  py_major is the major version of the
+        target Python.
+        """
+
+        self._py_major = py_major
+
+        # The source file (None for an extension module) of each known module.
+        self._modules = {}
+
+        # Any additional dependencies of each known module.
+        self._dependencies = {}
+
+        # The names of the modules whose source files couldn't be parsed.
+        self.unparseable = []
+
+    def add_module(self, name, source_file=None, dependencies=()):
+        """ Add a module that may be imported.  source_file is the name of the
+        module's source file or None if it is an extension module.
+        dependencies is a sequence of the names of any modules that the module
+        is known to import but which cannot be determined from its source.
+        """
+
+        self._modules[name] = source_file
+
+        if dependencies:
+            self._dependencies.setdefault(name, set()).update(dependencies)
+
+    def get_reachable(self, roots, root_files=()):
+        """ Return the set of the names of known modules that are imported,
+        directly or indirectly, by a sequence of root modules and a sequence of
+        root source files.  Roots that are not known modules are ignored.
+        """
+
+        reachable = set()
+        to_visit = [root for root in roots if root in self._modules]
+
+        for root_file in root_files:
+            to_visit.extend(self._get_imports(root_file, '', root_file))
+
+        while to_visit:
+            name = to_visit.pop()
+
+            if name in reachable:
+                continue
+
+            reachable.add(name)
+
+            to_visit.extend(self._dependencies.get(name, ()))
+
+            source_file = self._modules[name]
+
+            if source_file is not None:
+                if self._is_package(source_file):
+                    package = name
+                else:
+                    package = name.rpartition('.')[0]
+
+                to_visit.extend(self._get_imports(name, package, source_file))
+
+        return reachable
+
+    def _get_imports(self, name, package, source_file):
+        """ Return the set of the names of known modules imported by a module.
+        """
+
+        try:
+            with open(source_file, 'rb') as f:
+                tree = ast.parse(f.read(), source_file)
+        except (OSError, SyntaxError, ValueError):
+            self.unparseable.append(name)
+            return set()
+
+        imports = set()
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self._add_import(imports, alias.name, package)
+
+            elif isinstance(node, ast.ImportFrom):
+                if node.level == 0:
+                    base = node.module
+                    self._add_import(imports, base, package)
+                else:
+                    base_parts = package.split('.') if package else []
+
+                    if node.level > 1:
+                        del base_parts[1 - node.level:]
+
+                    if node.module:
+                        base_parts.append(node.module)
+
+                    base = '.'.join(base_parts)
+                    self._add_import(imports, base, '')
+
+                # Any of the names may be sub-modules.
+                for alias in node.names:
+                    if alias.name != '*':
+                        self._add_import(imports, base + '.' + alias.name, '')
+
+            elif isinstance(node, ast.Call):
+                # Handle the simple cases of dynamic imports, ie.
+                # __import__('name') and importlib.import_module('name').
+                func = node.func
+
+                if isinstance(func, ast.Name):
+                    func_name = func.id
+                elif isinstance(func, ast.Attribute):
+                    func_name = func.attr
+                else:
+                    continue
+
+                if func_name in ('__import__', 'import_module') and node.args:
+                    arg = node.args[0]
+                    value = getattr(arg, 'value', getattr(arg, 's', None))
+
+                    if isinstance(value, str):
+                        self._add_import(imports, value, '')
+
+        return imports
+
+    def _add_import(self, imports, name, package):
+        """ Add a module and its parent packages to a set of imports if they
+        are known.  package is the name of any package containing the
+        importing module.
+        """
+
+        if not name:
+            return
+
+        # Python v2 implicitly tries a relative import first.
+        if self._py_major < 3 and package:
+            self._add_import(imports, package + '.' + name, '')
+
+        parts = name.split('.')
+
+        for i in range(len(parts)):
+            prefix = '.'.join(parts[:i + 1])
+
+            if prefix in self._modules:
+                imports.add(prefix)
+
+    @staticmethod
+    def _is_package(source_file):
+        """ Return True if a source file is the __init__ module of a package.
+        """
+
+        return source_file.replace('\\', '/').endswith('/__init__.py')
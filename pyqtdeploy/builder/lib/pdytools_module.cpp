@@ -28,14 +28,25 @@
 #include <marshal.h>
 #include <structmember.h>
 
+#include <string.h>
+
 #include <QByteArray>
 #include <QChar>
 #include <QDir>
+#include <QFile>
 #include <QFileInfo>
+#include <QHash>
+#include <QResource>
 #include <QString>
 #include <QStringList>
 #include <QVector>
 
+#if QT_VERSION >= 0x040800
+#include <QElapsedTimer>
+#else
+#include <QTime>
+#endif
+
 #include "pyqtdeploy_version.h"
 
 
@@ -46,6 +57,17 @@
 
 extern "C" {
 
+// C linkage forward declarations of the module functions.
+static PyObject *pdytools_import_stats(PyObject *self, PyObject *args);
+
+
+// The module method table.
+static PyMethodDef pdytools_methods[] = {
+    {"import_stats", pdytools_import_stats, METH_NOARGS, NULL},
+    {NULL, NULL, 0, NULL}
+};
+
+
 #if PY_MAJOR_VERSION >= 3
 #if PY_MINOR_VERSION < 3
 #error "Python v3.3 or later is required"
@@ -65,7 +87,7 @@ static struct PyModuleDef pdytoolsmodule = {
     "pdytools",
     NULL,
     -1,
-    NULL,
+    pdytools_methods,
     NULL,
     NULL,
     NULL,
@@ -93,6 +115,19 @@ static const char extension_module_extension[] = ".so";
 #endif
 
 
+// The name of the resource containing the archive of frozen modules.  This
+// must be the same as the name used by the builder.
+static const char archive_name[] = ":/pyqtdeploy.pda";
+
+// The values that identify the format of the archive.
+static const char archive_magic[] = "PDYA";
+static const unsigned archive_version = 1;
+
+// The sizes of the archive header and of each entry.
+static const unsigned archive_header_size = 3 * 4;
+static const unsigned archive_entry_size = 5 * 4;
+
+
 // The importer object structure.
 typedef struct _qrcimporter
 {
@@ -203,16 +238,109 @@ enum ModuleType {
 };
 
 
+// The different types of an entry in the module index.
+enum IndexEntryType {
+    IndexModule,
+    IndexPackage,
+    IndexNamespace
+};
+
+
+// An entry in the module index generated by the builder.  The name is the
+// entry's resource path relative to the root without any '.pyo' or
+// '/__init__.pyo' suffix.  The bundle is the number of the deferred resource
+// file containing the entry or 0 if it is in the resources registered when the
+// application starts.
+struct ModuleIndexEntry {
+    const char *name;
+    IndexEntryType type;
+    int bundle;
+};
+
+#include "pyqtdeploy_modules.h"
+
+#if defined(PYQTDEPLOY_DEFERRED_RESOURCES)
+#include "pyqtdeploy_resources.h"
+#endif
+
+
+// The statistics recorded about the import of a module.  All times are in
+// microseconds.
+struct ImportStats {
+    ImportStats() : lookup_time(0), nr_bytes(0), unmarshal_time(0),
+            exec_time(0) {}
+
+    // The time spent finding the module.
+    qint64 lookup_time;
+
+    // The size of the marshalled code object.
+    qint64 nr_bytes;
+
+    // The time spent unmarshalling the code object.
+    qint64 unmarshal_time;
+
+    // The time spent executing the module's code (including the time spent
+    // importing any other modules it imports).
+    qint64 exec_time;
+};
+
+
+// A timer used when recording import statistics.
+class ImportTimer
+{
+public:
+    ImportTimer() {timer.start();}
+
+    // Return the elapsed time in microseconds.
+    qint64 elapsed() const
+    {
+#if QT_VERSION >= 0x040800
+        return timer.nsecsElapsed() / 1000;
+#else
+        return timer.elapsed() * 1000;
+#endif
+    }
+
+private:
+#if QT_VERSION >= 0x040800
+    QElapsedTimer timer;
+#else
+    QTime timer;
+#endif
+};
+
+
 // The internal API.
 void pdytools_init_executable_dir(const QString &argv0);
 const QDir &pdytools_get_executable_dir();
+void pdytools_dump_import_stats();
 
 
 // Other forward declarations.
 static ModuleType find_module(QrcImporter *self, const QString &fqmn,
         QString &pathname, QString &filename);
+static ModuleType lookup_module(QrcImporter *self, const QString &fqmn,
+        QString &pathname, QString &filename);
+static ImportStats &get_import_stats(const QString &fqmn);
 static bool read_data(const QString &filename, QByteArray &data);
-static PyObject *get_code_object(const QString &filename);
+static bool is_qrc_dir(const QString &path);
+static const ModuleIndexEntry *find_index_entry(const QString &name);
+#if defined(HAVE_DYNAMIC_LOADING)
+static const QHash<QString, QString> &get_adjacent_extension_modules();
+#if PY_VERSION_HEX >= 0x03040000
+static PyObject *load_adjacent_extension_module(PyObject *py_fqmn,
+        const QString &filename);
+#endif
+#endif
+#if defined(PYQTDEPLOY_DEFERRED_RESOURCES)
+static bool register_deferred_resource(int bundle);
+#endif
+static const QByteArray &get_archive();
+static bool find_archive_entry(const QString &name, unsigned &entry_type,
+        QByteArray &data);
+static unsigned read_uint32(const char *p);
+static PyObject *get_code_object(const QString &fqmn,
+        const QString &filename);
 static void raise_import_error(const QString &fqmn);
 static QString str_to_qstring(PyObject *str);
 static PyObject *qstring_to_str(const QString &qstring);
@@ -221,6 +349,19 @@ static PyObject *qstring_to_str(const QString &qstring);
 // The directory containing the application executable.
 static QDir *executable_dir = 0;
 
+#if defined(HAVE_DYNAMIC_LOADING)
+// The file names of the adjacent extension modules keyed by the module name.
+static QHash<QString, QString> *adjacent_extension_modules = 0;
+#endif
+
+// Set if import statistics are being recorded.
+static bool import_stats_enabled = false;
+
+// The import statistics of each module in the order in which they were first
+// looked up.
+static QHash<QString, ImportStats> *import_stats = 0;
+static QStringList *import_stats_order = 0;
+
 
 // The importer initialisation function.
 static int qrcimporter_init(PyObject *self, PyObject *args, PyObject *kwds)
@@ -241,7 +382,7 @@ static int qrcimporter_init(PyObject *self, PyObject *args, PyObject *kwds)
 
     QString *q_path = new QString(str_to_qstring(path));
 
-    if (!q_path->startsWith(QChar(':')) || !QFileInfo(*q_path).isDir())
+    if (!q_path->startsWith(QChar(':')) || !is_qrc_dir(*q_path))
     {
         delete q_path;
 
@@ -439,12 +580,12 @@ static PyObject *qrcimporter_load_module(PyObject *self, PyObject *args)
 
     if (mt == ModuleIsAdjacentExtensionModule)
     {
+#if PY_VERSION_HEX >= 0x03040000
+        return load_adjacent_extension_module(py_fqmn, filename);
+#else
         // We use the imp module to load sub-packages that are dynamically
         // linked extension modules installed in the same directory as the
         // executable.
-        // TODO - Reimplement without using the imp module for Python v3.4 and
-        // later.  Change the meta-data for the imp module for Python v3.4 to
-        // be PythonModule rather than CorePythonModule.
         static PyObject *load_module = NULL;
         static PyObject *open_file = NULL;
 
@@ -493,6 +634,7 @@ static PyObject *qrcimporter_load_module(PyObject *self, PyObject *args)
         Py_DECREF(py_filename);
 
         return module;
+#endif
     }
 
     if (mt != ModuleIsModule && mt != ModuleIsPackage)
@@ -502,7 +644,7 @@ static PyObject *qrcimporter_load_module(PyObject *self, PyObject *args)
     }
 
     // Read in the code object from the file.
-    code = get_code_object(filename);
+    code = get_code_object(fqmn, filename);
     if (!code)
         return NULL;
 
@@ -544,13 +686,20 @@ static PyObject *qrcimporter_load_module(PyObject *self, PyObject *args)
     if (!py_filename)
         goto error;
 
+    {
+        ImportTimer timer;
+
 #if PY_MAJOR_VERSION >= 3
-    mod = PyImport_ExecCodeModuleObject(py_fqmn, code, py_filename, NULL);
+        mod = PyImport_ExecCodeModuleObject(py_fqmn, code, py_filename, NULL);
 #else
-    mod = PyImport_ExecCodeModuleEx(PyString_AS_STRING(py_fqmn), code,
-            PyString_AS_STRING(py_filename));
+        mod = PyImport_ExecCodeModuleEx(PyString_AS_STRING(py_fqmn), code,
+                PyString_AS_STRING(py_filename));
 #endif
 
+        if (import_stats_enabled)
+            get_import_stats(fqmn).exec_time += timer.elapsed();
+    }
+
     Py_DECREF(py_filename);
     Py_DECREF(code);
 
@@ -582,7 +731,7 @@ static PyObject *qrcimporter_get_code(PyObject *self, PyObject *args)
 
     case ModuleIsModule:
     case ModuleIsPackage:
-        result = get_code_object(filename);
+        result = get_code_object(fqmn, filename);
         break;
 
     default:
@@ -658,6 +807,23 @@ static PyObject *qrcimporter_get_data(PyObject *self, PyObject *args)
 // type, path name and file name.
 static ModuleType find_module(QrcImporter *self, const QString &fqmn,
         QString &pathname, QString &filename)
+{
+    if (!import_stats_enabled)
+        return lookup_module(self, fqmn, pathname, filename);
+
+    ImportTimer timer;
+
+    ModuleType mt = lookup_module(self, fqmn, pathname, filename);
+
+    get_import_stats(fqmn).lookup_time += timer.elapsed();
+
+    return mt;
+}
+
+
+// Do the work of find_module().
+static ModuleType lookup_module(QrcImporter *self, const QString &fqmn,
+        QString &pathname, QString &filename)
 {
     QStringList fqmn_parts = fqmn.split(QChar('.'));
     QString fqmn_last = fqmn_parts.takeLast();
@@ -668,60 +834,231 @@ static ModuleType find_module(QrcImporter *self, const QString &fqmn,
 
     pathname = *self->path + fqmn_last;
 
-    // See if it is an ordinary module.
-    filename = pathname + ".pyo";
+    // See if it is in the index of the resource.
+    const ModuleIndexEntry *mie = find_index_entry(pathname.mid(2));
+    bool is_namespace = false;
 
-    if (QFileInfo(filename).isFile())
-        return ModuleIsModule;
+    if (mie)
+    {
+#if defined(PYQTDEPLOY_DEFERRED_RESOURCES)
+        // Make sure any deferred resource containing it has been registered.
+        if (mie->bundle > 0 && !register_deferred_resource(mie->bundle))
+            return ModuleNotFound;
+#endif
 
-    // See if it is a package.
-    filename = pathname + "/__init__.pyo";
+        switch (mie->type)
+        {
+        case IndexModule:
+            filename = pathname + ".pyo";
+            return ModuleIsModule;
 
-    if (QFileInfo(filename).isFile())
-        return ModuleIsPackage;
+        case IndexPackage:
+            filename = pathname + "/__init__.pyo";
+            return ModuleIsPackage;
 
+        case IndexNamespace:
+            // Adjacent extension modules take precedence over namespaces.
+            is_namespace = true;
+            break;
+        }
+    }
+
+#if defined(HAVE_DYNAMIC_LOADING)
     // See if it is an adjacent extension module.  Allow for the fact that we
     // can be called before we have set the executable directory.
     if (executable_dir)
     {
-        const QDir &exec_dir = pdytools_get_executable_dir();
+        const QHash<QString, QString> &adjacent = get_adjacent_extension_modules();
+        QHash<QString, QString>::const_iterator it = adjacent.constFind(fqmn);
 
-        QString em_name(fqmn);
-        em_name.append(extension_module_extension);
+        if (it != adjacent.constEnd())
+        {
+            filename = it.value();
+            return ModuleIsAdjacentExtensionModule;
+        }
+    }
+#endif
+
+    // See if it is a namespace.
+    filename = pathname;
+
+    if (is_namespace)
+        return ModuleIsNamespace;
 
+    // Nothing was found.
+    return ModuleNotFound;
+}
+
+
+#if defined(HAVE_DYNAMIC_LOADING)
+// Return the adjacent extension modules.  The directories are only read once
+// so that failing to find a module doesn't involve any file system access.
+static const QHash<QString, QString> &get_adjacent_extension_modules()
+{
+    if (adjacent_extension_modules)
+        return *adjacent_extension_modules;
+
+    adjacent_extension_modules = new QHash<QString, QString>;
+
+    const QDir &exec_dir = pdytools_get_executable_dir();
+    QString ext = QString::fromLatin1(extension_module_extension);
+
+    // The directories in order of preference.
+    QStringList dir_names;
 #if defined(Q_OS_DARWIN)
-        // The PlugIns directory is the prefered location for dynamic modules.
-        filename = exec_dir.filePath(QString("../PlugIns/%1").arg(em_name));
+    // The PlugIns directory is the prefered location for dynamic modules.
+    dir_names << "../PlugIns" << "../Frameworks";
+#endif
+    dir_names << ".";
 
-        if (QFileInfo(filename).isFile())
-            return ModuleIsAdjacentExtensionModule;
+    for (int d = 0; d < dir_names.size(); ++d)
+    {
+        QDir dir(exec_dir.filePath(dir_names.at(d)));
+        QStringList names = dir.entryList(QStringList(QChar('*') + ext),
+                QDir::Files);
 
-        filename = exec_dir.filePath(QString("../Frameworks/%1").arg(em_name));
+        for (int n = 0; n < names.size(); ++n)
+        {
+            const QString &name = names.at(n);
+            QString fqmn = name.left(name.length() - ext.length());
 
-        if (QFileInfo(filename).isFile())
-            return ModuleIsAdjacentExtensionModule;
+            if (!adjacent_extension_modules->contains(fqmn))
+                adjacent_extension_modules->insert(fqmn, dir.filePath(name));
+        }
+    }
+
+    return *adjacent_extension_modules;
+}
+
+
+#if PY_VERSION_HEX >= 0x03040000
+// Load an adjacent extension module using the PEP 451 support of the frozen
+// bootstrap modules (which are always imported) rather than the imp module.
+static PyObject *load_adjacent_extension_module(PyObject *py_fqmn,
+        const QString &filename)
+{
+    static PyObject *extension_file_loader = NULL;
+    static PyObject *spec_from_file_location = NULL;
+    static PyObject *load = NULL;
+
+    if (!load)
+    {
+        PyObject *bootstrap = PyImport_ImportModule("_frozen_importlib");
+        if (!bootstrap)
+            return NULL;
+
+#if PY_VERSION_HEX >= 0x03050000
+        PyObject *bootstrap_external = PyImport_ImportModule(
+                "_frozen_importlib_external");
+        if (!bootstrap_external)
+        {
+            Py_DECREF(bootstrap);
+            return NULL;
+        }
+#else
+        PyObject *bootstrap_external = bootstrap;
+        Py_INCREF(bootstrap_external);
 #endif
 
-        filename = exec_dir.filePath(em_name);
+        extension_file_loader = PyObject_GetAttrString(bootstrap_external,
+                "ExtensionFileLoader");
+        spec_from_file_location = PyObject_GetAttrString(bootstrap_external,
+                "spec_from_file_location");
+        load = PyObject_GetAttrString(bootstrap, "_load");
 
-        if (QFileInfo(filename).isFile())
-            return ModuleIsAdjacentExtensionModule;
+        Py_DECREF(bootstrap_external);
+        Py_DECREF(bootstrap);
+
+        if (!extension_file_loader || !spec_from_file_location || !load)
+        {
+            Py_CLEAR(extension_file_loader);
+            Py_CLEAR(spec_from_file_location);
+            Py_CLEAR(load);
+
+            return NULL;
+        }
     }
 
-    // See if it is a namespace.
-    filename = pathname;
+    PyObject *py_filename = qstring_to_str(filename);
+    if (!py_filename)
+        return NULL;
 
-    if (QFileInfo(filename).isDir())
-        return ModuleIsNamespace;
+    PyObject *loader = PyObject_CallFunctionObjArgs(extension_file_loader,
+            py_fqmn, py_filename, NULL);
+    if (!loader)
+    {
+        Py_DECREF(py_filename);
+        return NULL;
+    }
 
-    // Nothing was found.
-    return ModuleNotFound;
+    PyObject *spec_args = Py_BuildValue("(OO)", py_fqmn, py_filename);
+    PyObject *spec_kwds = Py_BuildValue("{sO}", "loader", loader);
+
+    Py_DECREF(loader);
+    Py_DECREF(py_filename);
+
+    if (!spec_args || !spec_kwds)
+    {
+        Py_XDECREF(spec_args);
+        Py_XDECREF(spec_kwds);
+        return NULL;
+    }
+
+    PyObject *spec = PyObject_Call(spec_from_file_location, spec_args,
+            spec_kwds);
+
+    Py_DECREF(spec_args);
+    Py_DECREF(spec_kwds);
+
+    if (!spec)
+        return NULL;
+
+    // This handles sys.modules and the module's import related attributes.
+    PyObject *module = PyObject_CallFunctionObjArgs(load, spec, NULL);
+
+    Py_DECREF(spec);
+
+    return module;
 }
+#endif
+#endif
 
 
-// Get the data from a file.
+// Get the data from a file.  The data may be shared with a resource and must
+// not be modified.
 static bool read_data(const QString &filename, QByteArray &data)
 {
+    // See if it is a frozen module in the archive.
+    if (filename.startsWith(QLatin1String(":/")) && filename.endsWith(QLatin1String(".pyo")) && !get_archive().isEmpty())
+    {
+        QString name = filename.mid(2, filename.length() - 6);
+        unsigned expected_type = IndexModule, entry_type;
+
+        if (name.endsWith(QLatin1String("/__init__")))
+        {
+            name.chop(9);
+            expected_type = IndexPackage;
+        }
+
+        if (find_archive_entry(name, entry_type, data) && entry_type == expected_type)
+            return true;
+    }
+
+    // Resources that are uncompressed are already in memory so avoid copying
+    // them.
+    if (filename.startsWith(QChar(':')))
+    {
+        QResource resource(filename);
+
+        if (resource.isValid() && !resource.isCompressed() && resource.data())
+        {
+            data = QByteArray::fromRawData((const char *)resource.data(),
+                    resource.size());
+
+            return true;
+        }
+    }
+
     QFile mfile(filename);
 
     if (!mfile.open(QIODevice::ReadOnly))
@@ -739,15 +1076,278 @@ static bool read_data(const QString &filename, QByteArray &data)
 }
 
 
-// Get the code object from a file.
-static PyObject *get_code_object(const QString &filename)
+// Get the code object of a module from a file.
+static PyObject *get_code_object(const QString &fqmn, const QString &filename)
 {
     QByteArray data;
 
     if (!read_data(filename, data))
         return NULL;
 
-    return PyMarshal_ReadObjectFromString(data.data(), data.size());
+    ImportTimer timer;
+
+    // Note that the data may be shared with a resource so we must not modify
+    // it.
+    PyObject *code = PyMarshal_ReadObjectFromString((char *)data.constData(),
+            data.size());
+
+    if (import_stats_enabled)
+    {
+        ImportStats &stats = get_import_stats(fqmn);
+
+        stats.unmarshal_time += timer.elapsed();
+        stats.nr_bytes = data.size();
+    }
+
+    return code;
+}
+
+
+// Return the import statistics of a module, creating them if necessary.
+static ImportStats &get_import_stats(const QString &fqmn)
+{
+    if (!import_stats)
+    {
+        import_stats = new QHash<QString, ImportStats>;
+        import_stats_order = new QStringList;
+    }
+
+    if (!import_stats->contains(fqmn))
+        import_stats_order->append(fqmn);
+
+    return (*import_stats)[fqmn];
+}
+
+
+// Implement import_stats() for the module.
+static PyObject *pdytools_import_stats(PyObject *, PyObject *)
+{
+    PyObject *stats_list = PyList_New(0);
+
+    if (!stats_list || !import_stats)
+        return stats_list;
+
+    for (int i = 0; i < import_stats_order->size(); ++i)
+    {
+        const QString &fqmn = import_stats_order->at(i);
+        const ImportStats &stats = import_stats->value(fqmn);
+
+        PyObject *py_fqmn = qstring_to_str(fqmn);
+        if (!py_fqmn)
+        {
+            Py_DECREF(stats_list);
+            return NULL;
+        }
+
+        PyObject *stats_tuple = Py_BuildValue("(NLLLL)", py_fqmn,
+                (PY_LONG_LONG)stats.lookup_time,
+                (PY_LONG_LONG)stats.nr_bytes,
+                (PY_LONG_LONG)stats.unmarshal_time,
+                (PY_LONG_LONG)stats.exec_time);
+
+        if (!stats_tuple || PyList_Append(stats_list, stats_tuple) < 0)
+        {
+            Py_XDECREF(stats_tuple);
+            Py_DECREF(stats_list);
+            return NULL;
+        }
+
+        Py_DECREF(stats_tuple);
+    }
+
+    return stats_list;
+}
+
+
+// Return true if a qrc path is a directory.
+static bool is_qrc_dir(const QString &path)
+{
+    // Note that packages in the archive don't have a directory of their own.
+    QString name = path.mid(2);
+
+    if (name.isEmpty())
+        return true;
+
+    if (name.endsWith(QChar('/')))
+        name.chop(1);
+
+    const ModuleIndexEntry *mie = find_index_entry(name);
+
+    if (mie)
+        return (mie->type != IndexModule);
+
+    return QFileInfo(path).isDir();
+}
+
+
+// Find an entry in the module index given its name.  Return 0 if there was no
+// entry.
+static const ModuleIndexEntry *find_index_entry(const QString &name)
+{
+    static QHash<QString, const ModuleIndexEntry *> *module_index = 0;
+
+    if (!module_index)
+    {
+        module_index = new QHash<QString, const ModuleIndexEntry *>;
+
+        for (const ModuleIndexEntry *mie = module_index_entries; mie->name; ++mie)
+            module_index->insert(QString::fromUtf8(mie->name), mie);
+    }
+
+    return module_index->value(name, 0);
+}
+
+
+#if defined(PYQTDEPLOY_DEFERRED_RESOURCES)
+// Register a deferred resource file given its number if it hasn't already been
+// done.  Return true if the resource is registered.
+static bool register_deferred_resource(int bundle)
+{
+    static QVector<bool> *registered = 0;
+
+    if (!registered)
+    {
+        int nr_bundles = 0;
+
+        while (deferred_resources[nr_bundles])
+            ++nr_bundles;
+
+        registered = new QVector<bool>(nr_bundles, false);
+    }
+
+    if (bundle > registered->size())
+        return false;
+
+    if (registered->at(bundle - 1))
+        return true;
+
+    // We can't do anything until we know where the executable is.
+    if (!executable_dir)
+        return false;
+
+    const QDir &exec_dir = pdytools_get_executable_dir();
+    QString rcc_name = QString::fromUtf8(deferred_resources[bundle - 1]);
+    QString rcc_path = exec_dir.filePath(rcc_name);
+
+#if defined(Q_OS_DARWIN)
+    // Allow for an application bundle.
+    if (!QFileInfo(rcc_path).isFile())
+        rcc_path = exec_dir.filePath(QString("../Resources/%1").arg(rcc_name));
+#endif
+
+    if (!QResource::registerResource(rcc_path))
+    {
+        PySys_WriteStderr("qrcimporter: unable to register %s\n",
+                QDir::toNativeSeparators(rcc_path).toLocal8Bit().constData());
+        return false;
+    }
+
+    (*registered)[bundle - 1] = true;
+
+    return true;
+}
+#endif
+
+
+// Return the archive of frozen modules.  It will be empty if there is no
+// archive.
+static const QByteArray &get_archive()
+{
+    static QByteArray *archive = 0;
+
+    if (!archive)
+    {
+        archive = new QByteArray;
+
+        QResource resource(QLatin1String(archive_name));
+
+        if (resource.isValid())
+        {
+            // The builder makes sure the archive isn't compressed so that it
+            // can be used without being copied.
+            if (resource.isCompressed())
+                *archive = qUncompress(resource.data(), resource.size());
+            else
+                *archive = QByteArray::fromRawData(
+                        (const char *)resource.data(), resource.size());
+
+            // Ignore the archive if it doesn't look valid.
+            const char *base = archive->constData();
+            unsigned size = archive->size();
+
+            if (size < archive_header_size || memcmp(base, archive_magic, 4) != 0 || read_uint32(base + 4) != archive_version || (size - archive_header_size) / archive_entry_size < read_uint32(base + 8))
+                archive->clear();
+        }
+    }
+
+    return *archive;
+}
+
+
+// Find an entry in the archive given its name (ie. its resource path relative
+// to the root without any extension) and return its type and data.  The data
+// is shared with the archive.
+static bool find_archive_entry(const QString &name, unsigned &entry_type,
+        QByteArray &data)
+{
+    const QByteArray &archive = get_archive();
+
+    if (archive.isEmpty())
+        return false;
+
+    const char *base = archive.constData();
+    QByteArray name_utf8 = name.toUtf8();
+    unsigned name_size = name_utf8.size();
+
+    // The entries are sorted by name so do a binary search.
+    unsigned lo = 0, hi = read_uint32(base + 8);
+
+    while (lo < hi)
+    {
+        unsigned mid = (lo + hi) / 2;
+        const char *entry = base + archive_header_size + mid * archive_entry_size;
+
+        unsigned entry_name_size = read_uint32(entry + 4);
+
+        int cmp = memcmp(base + read_uint32(entry),
+                name_utf8.constData(), qMin(entry_name_size, name_size));
+
+        if (cmp == 0)
+        {
+            if (entry_name_size < name_size)
+                cmp = -1;
+            else if (entry_name_size > name_size)
+                cmp = 1;
+        }
+
+        if (cmp < 0)
+        {
+            lo = mid + 1;
+        }
+        else if (cmp > 0)
+        {
+            hi = mid;
+        }
+        else
+        {
+            entry_type = read_uint32(entry + 16);
+            data = QByteArray::fromRawData(base + read_uint32(entry + 8),
+                    read_uint32(entry + 12));
+
+            return true;
+        }
+    }
+
+    return false;
+}
+
+
+// Read a little-endian 32 bit unsigned integer.
+static unsigned read_uint32(const char *p)
+{
+    const unsigned char *up = (const unsigned char *)p;
+
+    return up[0] | (up[1] << 8) | (up[2] << 16) | ((unsigned)up[3] << 24);
 }
 
 
@@ -823,6 +1423,49 @@ const QDir &pdytools_get_executable_dir()
 }
 
 
+// Write any import statistics as CSV to the file named by the
+// PYQTDEPLOY_IMPORT_STATS environment variable or to stderr if it is empty or
+// '-'.
+void pdytools_dump_import_stats()
+{
+    if (!import_stats)
+        return;
+
+    QByteArray stats_file_name = qgetenv("PYQTDEPLOY_IMPORT_STATS");
+    QFile stats_file;
+    bool opened;
+
+    if (stats_file_name.isEmpty() || stats_file_name == "-")
+    {
+        opened = stats_file.open(stderr, QIODevice::WriteOnly);
+    }
+    else
+    {
+        stats_file.setFileName(QFile::decodeName(stats_file_name));
+        opened = stats_file.open(QIODevice::WriteOnly|QIODevice::Truncate);
+    }
+
+    if (!opened)
+    {
+        fprintf(stderr, "pdytools: unable to write the import statistics to %s\n",
+                stats_file_name.constData());
+        return;
+    }
+
+    stats_file.write("module,lookup_us,bytes,unmarshal_us,exec_us\n");
+
+    for (int i = 0; i < import_stats_order->size(); ++i)
+    {
+        const QString &fqmn = import_stats_order->at(i);
+        const ImportStats &stats = import_stats->value(fqmn);
+
+        stats_file.write(QString("%1,%2,%3,%4,%5\n").arg(fqmn).arg(stats.lookup_time).arg(stats.nr_bytes).arg(stats.unmarshal_time).arg(stats.exec_time).toUtf8());
+    }
+
+    stats_file.close();
+}
+
+
 // The module initialisation function.
 PYQTDEPLOY_TYPE PYQTDEPLOY_INIT()
 {
@@ -831,13 +1474,20 @@ PYQTDEPLOY_TYPE PYQTDEPLOY_INIT()
     // Just in case we are linking against Python as a Windows DLL.
     QrcImporter_Type.tp_new = PyType_GenericNew;
 
+    // See if import statistics should be recorded.
+#if defined(PYQTDEPLOY_IMPORT_STATS)
+    import_stats_enabled = true;
+#else
+    import_stats_enabled = !qgetenv("PYQTDEPLOY_IMPORT_STATS").isEmpty();
+#endif
+
     if (PyType_Ready(&QrcImporter_Type) < 0)
         PYQTDEPLOY_FATAL("Failed to initialise pdytools.qrcimporter type");
 
 #if PY_MAJOR_VERSION >= 3
     mod = PyModule_Create(&pdytoolsmodule);
 #else
-    mod = Py_InitModule("pdytools", NULL);
+    mod = Py_InitModule("pdytools", pdytools_methods);
 #endif
     if (mod == NULL)
         PYQTDEPLOY_FATAL("Failed to initialise pdytools module");
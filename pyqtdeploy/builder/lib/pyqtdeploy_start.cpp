@@ -25,11 +25,13 @@
 
 
 #include <stdio.h>
+#include <stdlib.h>
 
 #include <Python.h>
 
 #include <QByteArray>
 #include <QDir>
+#include <QElapsedTimer>
 #include <QString>
 #include <QRegExp>
 #include <QTextCodec>
@@ -44,6 +46,17 @@
 #include "frozen_main.h"
 #endif
 
+#if defined(PYQTDEPLOY_EXTERNAL_RESOURCES)
+#include <QFileInfo>
+#include <QResource>
+
+#if defined(Q_OS_WIN)
+#include <windows.h>
+#endif
+
+#include "pyqtdeploy_resources.h"
+#endif
+
 
 #if PY_MAJOR_VERSION >= 3
 
@@ -70,6 +83,7 @@ extern "C" void initpdytools(void);
 // The internal API.
 void pdytools_init_executable_dir(const QString &argv0);
 const QDir &pdytools_get_executable_dir();
+void pdytools_dump_import_stats();
 
 
 // We use Qt as the source of the locale information, partly because it
@@ -79,10 +93,21 @@ static QTextCodec *locale_codec;
 
 // Foward declarations.
 static int handle_exception();
+static int finalise(int exit_code);
+#if defined(PYQTDEPLOY_FAST_EXIT)
+static void flush_std_file(const char *name);
+#if defined(PYQTDEPLOY_RUN_ATEXIT)
+static void run_atexit_handlers();
+#endif
+#endif
 static int append_path_dirs(PyObject *list, const char **path_dirs);
 #if PY_MAJOR_VERSION < 3
 static PyObject *string_from_qstring(const QString &qs);
 #endif
+#if defined(PYQTDEPLOY_EXTERNAL_RESOURCES)
+static bool register_external_resources(const QString &argv0);
+static QDir get_executable_dir(const QString &argv0);
+#endif
 
 
 #if defined(WIDE_ARGV)
@@ -132,6 +157,17 @@ int pyqtdeploy_start(int argc, char **argv,
         return 1;
     }
 
+#if defined(PYQTDEPLOY_EXTERNAL_RESOURCES)
+    // Register the external resources.  This must be done before the
+    // interpreter is initialised as it imports modules from them.
+#if defined(WIDE_ARGV)
+    if (!register_external_resources(QString::fromWCharArray(w_argv[0])))
+#else
+    if (!register_external_resources(locale_codec->toUnicode(argv[0])))
+#endif
+        return 1;
+#endif
+
     // Initialise some Python globals.
     Py_FrozenFlag = 1;
     Py_NoSiteFlag = 1;
@@ -289,10 +325,7 @@ int pyqtdeploy_start(int argc, char **argv,
         return handle_exception();
 #endif
 
-    // Tidy up.
-    Py_Finalize();
-
-    return 0;
+    return finalise(0);
 }
 
 
@@ -352,12 +385,106 @@ static int handle_exception()
         exit_code = 1;
     }
 
+    return finalise(exit_code);
+}
+
+
+// Tidy up before the application exits and return the exit code.  The time
+// taken is written to stderr if the PYQTDEPLOY_SHUTDOWN_TIME environment
+// variable is set.
+static int finalise(int exit_code)
+{
+    QElapsedTimer timer;
+    bool report_time = !qgetenv("PYQTDEPLOY_SHUTDOWN_TIME").isEmpty();
+
+    if (report_time)
+        timer.start();
+
+    pdytools_dump_import_stats();
+
+#if defined(PYQTDEPLOY_FAST_EXIT)
+    // Do only what is visible to the user rather than tearing down the
+    // interpreter.  Note that, unlike Py_Finalize(), this does not wait for
+    // any non-daemon threads.
+#if defined(PYQTDEPLOY_RUN_ATEXIT)
+    run_atexit_handlers();
+#endif
+
+    flush_std_file("stdout");
+    flush_std_file("stderr");
+
+    fflush(stdout);
+    fflush(stderr);
+
+    if (report_time)
+        fprintf(stderr, "pyqtdeploy: shutdown took %lld us\n",
+                timer.nsecsElapsed() / 1000);
+
+    _Exit(exit_code);
+#else
     Py_Finalize();
 
+    if (report_time)
+        fprintf(stderr, "pyqtdeploy: shutdown took %lld us\n",
+                timer.nsecsElapsed() / 1000);
+#endif
+
     return exit_code;
 }
 
 
+#if defined(PYQTDEPLOY_FAST_EXIT)
+// Flush one of the Python standard file objects.
+static void flush_std_file(const char *name)
+{
+    PyObject *f = PySys_GetObject(CONST_CAST(name));
+
+    if (f == NULL || f == Py_None)
+        return;
+
+    PyObject *res = PyObject_CallMethod(f, CONST_CAST("flush"), NULL);
+
+    if (res)
+        Py_DECREF(res);
+    else
+        PyErr_Clear();
+}
+
+
+#if defined(PYQTDEPLOY_RUN_ATEXIT)
+// Run any functions registered with the atexit module.
+static void run_atexit_handlers()
+{
+    PyObject *res;
+
+#if PY_MAJOR_VERSION >= 3
+    // The module will only have been imported if handlers may have been
+    // registered.
+    PyObject *atexit = PyDict_GetItemString(PyImport_GetModuleDict(),
+            "atexit");
+
+    if (atexit == NULL)
+        return;
+
+    res = PyObject_CallMethod(atexit, CONST_CAST("_run_exitfuncs"), NULL);
+#else
+    PyObject *exitfunc = PySys_GetObject(CONST_CAST("exitfunc"));
+
+    if (exitfunc == NULL)
+        return;
+
+    res = PyObject_CallObject(exitfunc, NULL);
+#endif
+
+    if (res)
+        Py_DECREF(res);
+    else
+        PyErr_Clear();
+}
+#endif
+#endif
+
+
 // Extend a list with an array of UTF-8 encoded path directory names.  Return
 // -1 if there was an error.
 static int append_path_dirs(PyObject *list, const char **path_dirs)
@@ -430,3 +557,78 @@ static PyObject *string_from_qstring(const QString &qs)
     return PyString_FromStringAndSize(locale_s, locale_s.length());
 }
 #endif
+
+
+#if defined(PYQTDEPLOY_EXTERNAL_RESOURCES)
+// Register the external resources installed with the executable.  Return false
+// if there was an error.
+static bool register_external_resources(const QString &argv0)
+{
+    QDir exec_dir = get_executable_dir(argv0);
+
+    for (const char **rcc = external_resources; *rcc != NULL; ++rcc)
+    {
+        QString rcc_name = QString::fromUtf8(*rcc);
+        QString rcc_path = exec_dir.filePath(rcc_name);
+
+#if defined(Q_OS_DARWIN)
+        // Allow for the resources being in an application bundle.
+        if (!QFileInfo(rcc_path).exists())
+            rcc_path = exec_dir.filePath(QString("../Resources/%1").arg(rcc_name));
+#endif
+
+        if (!QResource::registerResource(rcc_path))
+        {
+            fprintf(stderr, "%s: unable to register resource file %s\n",
+                    locale_codec->fromUnicode(argv0).constData(),
+                    locale_codec->fromUnicode(QDir::toNativeSeparators(rcc_path)).constData());
+            return false;
+        }
+    }
+
+    return true;
+}
+
+
+// Return the directory containing the executable.  This is needed before the
+// interpreter has been initialised.
+static QDir get_executable_dir(const QString &argv0)
+{
+    QString exec_name;
+
+#if defined(Q_OS_WIN)
+    wchar_t buf[MAX_PATH];
+    DWORD len = GetModuleFileNameW(NULL, buf, MAX_PATH);
+
+    if (len > 0 && len < MAX_PATH)
+        exec_name = QString::fromWCharArray(buf, len);
+#elif defined(Q_OS_LINUX)
+    exec_name = QFileInfo("/proc/self/exe").symLinkTarget();
+#endif
+
+    if (exec_name.isEmpty())
+    {
+        exec_name = argv0;
+
+        // If there is no directory then the executable was found on PATH.
+        if (!exec_name.contains(QChar('/')))
+        {
+            QStringList path = locale_codec->toUnicode(qgetenv("PATH")).split(
+                    QChar(':'), QString::SkipEmptyParts);
+
+            for (int i = 0; i < path.size(); ++i)
+            {
+                QFileInfo fi(QDir(path.at(i)), argv0);
+
+                if (fi.isExecutable())
+                {
+                    exec_name = fi.filePath();
+                    break;
+                }
+            }
+        }
+    }
+
+    return QFileInfo(exec_name).absoluteDir();
+}
+#endif
@@ -105,6 +105,15 @@ class ApplicationPage(QWidget):
                 textEdited=self._sys_path_changed)
         form.addRow("sys.path", self._sys_path_edit)
 
+        self._cython_modules_edit = QLineEdit(
+                placeholderText="Modules to compile with Cython",
+                whatsThis="A space separated list of the names of modules "
+                        "to compile to C using Cython. If the name of a "
+                        "package is given then all its modules (but not its "
+                        "<tt>__init__.py</tt>) are compiled.",
+                textEdited=self._cython_modules_changed)
+        form.addRow("Cython modules", self._cython_modules_edit)
+
         layout.addLayout(form, 0, 0)
 
         options_layout = BetterForm()
@@ -139,6 +148,20 @@ class ApplicationPage(QWidget):
                 stateChanged=self._bundle_changed)
         options_layout.addRow(self._bundle_edit)
 
+        self._fast_exit_edit = QCheckBox("Fast exit",
+                whatsThis="Exit the application immediately after the "
+                        "standard streams have been flushed rather than "
+                        "finalising the Python interpreter. This reduces the "
+                        "time taken to close large applications.",
+                stateChanged=self._fast_exit_changed)
+        options_layout.addRow(self._fast_exit_edit)
+
+        self._run_atexit_edit = QCheckBox("Run atexit handlers",
+                whatsThis="Run any functions registered with the "
+                        "<tt>atexit</tt> module before a fast exit.",
+                stateChanged=self._run_atexit_changed)
+        options_layout.addRow(self._run_atexit_edit)
+
         layout.addLayout(options_layout, 0, 1)
 
         self._package_edit = _ApplicationPackageEditor()
@@ -159,6 +182,7 @@ class ApplicationPage(QWidget):
         self._script_edit.setText(project.application_script)
         self._entry_point_edit.setText(project.application_entry_point)
         self._sys_path_edit.setText(project.sys_path)
+        self._cython_modules_edit.setText(project.cython_modules)
         self._package_edit.configure(project.application_package, project)
 
         blocked = self._py_version_edit.blockSignals(True)
@@ -181,6 +205,17 @@ class ApplicationPage(QWidget):
                 Qt.Checked if project.application_is_bundle else Qt.Unchecked)
         self._bundle_edit.blockSignals(blocked)
 
+        blocked = self._fast_exit_edit.blockSignals(True)
+        self._fast_exit_edit.setCheckState(
+                Qt.Checked if project.application_fast_exit else Qt.Unchecked)
+        self._fast_exit_edit.blockSignals(blocked)
+
+        blocked = self._run_atexit_edit.blockSignals(True)
+        self._run_atexit_edit.setCheckState(
+                Qt.Checked if project.application_run_atexit else Qt.Unchecked)
+        self._run_atexit_edit.setEnabled(project.application_fast_exit)
+        self._run_atexit_edit.blockSignals(blocked)
+
     def _py_version_changed(self, idx):
         """ Invoked when the user changes the Python version number. """
 
@@ -210,6 +245,21 @@ class ApplicationPage(QWidget):
         self.project.application_is_bundle = (state == Qt.Checked)
         self.project.modified = True
 
+    def _fast_exit_changed(self, state):
+        """ Invoked when the user changes the fast exit state. """
+
+        fast_exit = (state == Qt.Checked)
+        self.project.application_fast_exit = fast_exit
+        self.project.modified = True
+
+        self._run_atexit_edit.setEnabled(fast_exit)
+
+    def _run_atexit_changed(self, state):
+        """ Invoked when the user changes the run atexit handlers state. """
+
+        self.project.application_run_atexit = (state == Qt.Checked)
+        self.project.modified = True
+
     def _name_changed(self, value):
         """ Invoked when the user edits the application name. """
 
@@ -234,6 +284,13 @@ class ApplicationPage(QWidget):
         self.project.sys_path = value.strip()
         self.project.modified = True
 
+    def _cython_modules_changed(self, value):
+        """ Invoked when the user edits the modules to compile with Cython.
+        """
+
+        self.project.cython_modules = value.strip()
+        self.project.modified = True
+
     def _package_changed(self):
         """ Invoked when the user edits the application package. """
 
@@ -25,6 +25,7 @@
 
 
 # Publish the sub-package's API.
+from .extension_libraries import *
 from .external_libs_metadata import *
 from .pyqt4 import *
 from .pyqt5 import *
@@ -0,0 +1,77 @@
+# Copyright (c) 2018, Riverbank Computing Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+
+import hashlib
+import os
+
+
+__all__ = ['get_extension_library_dir', 'get_extension_library_name',
+        'get_extension_module_configuration']
+
+
+def get_extension_library_dir(lib_dir, version):
+    """ Return the name of the directory containing the static libraries of
+    standard library extension modules for a particular version of Python.
+    lib_dir is the directory containing the target Python library.
+    """
+
+    return os.path.join(lib_dir,
+            'pdy-extensions-{0}.{1}.{2}'.format(*version)).replace('\\', '/')
+
+
+def get_extension_module_configuration(module, target):
+    """ Return a 3-tuple of the sources, DEFINES and INCLUDEPATH needed to
+    build a standard library extension module for a target architecture.  The
+    sources and INCLUDEPATH are relative to the Python source Modules
+    directory.
+    """
+
+    def resolve(scoped_values):
+        if scoped_values is None:
+            return ()
+
+        values = [target.get_scoped_value(v) for v in scoped_values]
+
+        return tuple(v for v in values if v is not None)
+
+    return (resolve(module.source), resolve(module.defines),
+            resolve(module.includepath))
+
+
+def get_extension_library_name(name, target, configuration, xlib_configuration=None):
+    """ Return the name of the static library (as passed to the linker)
+    containing a standard library extension module.  The name includes a
+    signature of the configuration used to build it (as returned by
+    get_extension_module_configuration()) and, if the module uses an external
+    library, the DEFINES and INCLUDEPATH of the external library.  A library
+    can only be used if it was built with the same configuration.
+    """
+
+    signature = repr((name, target.name, configuration, xlib_configuration))
+    signature = hashlib.sha1(signature.encode('utf-8')).hexdigest()[:12]
+
+    return 'pdy{0}_{1}'.format(name.replace('.', '_'), signature)
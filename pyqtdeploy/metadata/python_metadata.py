@@ -1954,11 +1954,11 @@ _metadata = {
         CorePythonModule(version=(3, 3),
                 deps=('_imp', 'importlib', 'importlib._bootstrap',
                         'importlib.machinery', 'os', 'tokenize', 'warnings')),
-        CorePythonModule(version=(3, 4),
+        PythonModule(version=(3, 4),
                 deps=('_imp', 'importlib', 'importlib._bootstrap',
                         'importlib.machinery', 'importlib.util', 'os',
                         'tokenize', 'types', 'warnings')),
-        CorePythonModule(min_version=(3, 5),
+        PythonModule(min_version=(3, 5),
                 deps=('_imp', 'importlib', 'importlib._bootstrap',
                         'importlib._bootstrap_external', 'importlib.machinery',
                         'importlib.util', 'os', 'tokenize', 'types',
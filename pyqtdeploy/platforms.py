@@ -129,6 +129,62 @@ class Architecture:
 
         self.platform.deconfigure()
 
+    def get_scoped_value(self, scoped_value):
+        """ Return the value from a (possibly) scoped value or None if the
+        value isn't valid for the architecture.
+        """
+
+        parts = scoped_value.split('#', maxsplit=1)
+        if len(parts) == 2:
+            scope, value = parts
+
+            if not self.is_targeted(scope):
+                value = None
+        else:
+            # The value is unscoped.
+            value = scoped_value
+
+        return value
+
+    def is_targeted(self, targets):
+        """ Returns True if the architecture is covered by a set of targets.
+        If the set of targets has a False value then the architecture is
+        covered.  If the set of targets is a sequence of platform names then
+        the architecture's platform must appear in the sequence.  If the set of
+        targets is a string then it is an expression of architecture or
+        platform names which must contain the architecture or platform name.
+        """
+
+        if targets:
+            if isinstance(targets, str):
+                # See if the string is a '|' separated list of targets.
+                targets = targets.split('|')
+                if len(targets) == 1:
+                    # There was no '|' so restore the original string.
+                    targets = targets[0]
+
+            if isinstance(targets, str):
+                # String targets can come from the project file (ie. the user)
+                # and so need to be validated.
+                if targets[0] == '!':
+                    # Note that this assumes that the target is a platform
+                    # rather than an architecture.  If this is incorrect then
+                    # it is a bug in the metadata somewhere.
+                    platform = Platform.platform(targets[1:])
+                    covered = (self.platform is not platform)
+                elif '-' in targets:
+                    architecture = Architecture.architecture(targets)
+                    covered = (self is architecture)
+                else:
+                    platform = Platform.platform(targets)
+                    covered = (self.platform is platform)
+            else:
+                covered = (self.platform.name in targets)
+        else:
+            covered = True
+
+        return covered
+
     @classmethod
     def architecture(cls, name=None):
         """ Return a singleton Architecture instance for an architecture.  If
@@ -93,9 +93,12 @@ class Project(QObject):
         self.application_is_pyqt5 = True
         self.application_is_console = False
         self.application_is_bundle = True
+        self.application_fast_exit = False
+        self.application_run_atexit = False
         self.application_package = QrcPackage()
         self.application_script = ''
         self.application_entry_point = ''
+        self.cython_modules = ''
         self.external_libraries = {}
         self.other_extension_modules = []
         self.other_packages = []
@@ -360,9 +363,14 @@ class Project(QObject):
 
         project.application_is_bundle = cls._get_bool(application, 'isbundle',
                 'Application')
+        project.application_fast_exit = cls._get_bool(application,
+                'fastexit', 'Application', default=False)
+        project.application_run_atexit = cls._get_bool(application,
+                'runatexit', 'Application', default=False)
         project.application_name = application.get('name', '')
         project.application_script = application.get('script', '')
         project.sys_path = application.get('syspath', '')
+        project.cython_modules = application.get('cythonmodules', '')
 
         # Any qmake configuration. This was added in version 5.
         qmake_configuration = application.find('QMakeConfiguration')
@@ -569,11 +577,14 @@ class Project(QObject):
         SubElement(root, 'Python', attrib=attrib)
 
         application = SubElement(root, 'Application', attrib={
+            'cythonmodules': self.cython_modules,
             'entrypoint': self.application_entry_point,
+            'fastexit': str(int(self.application_fast_exit)),
             'ispyqt5': str(int(self.application_is_pyqt5)),
             'isconsole': str(int(self.application_is_console)),
             'isbundle': str(int(self.application_is_bundle)),
             'name': self.application_name,
+            'runatexit': str(int(self.application_run_atexit)),
             'script': self.application_script,
             'syspath': self.sys_path})
 
@@ -37,30 +37,98 @@ def main():
     # Parse the command line.
     parser = argparse.ArgumentParser()
 
+    parser.add_argument('--archive',
+            help="store the frozen modules in a single archive rather than "
+                    "as individual resources",
+            action='store_true')
     parser.add_argument('--build-dir', help="the name of the build directory",
             metavar="DIR")
+    parser.add_argument('--cache-dir',
+            help="the directory used to cache frozen modules between builds",
+            metavar="DIR")
+    parser.add_argument('--cache-size',
+            help="the maximum size of the cache in megabytes where 0 is no "
+                    "limit [default: 500]",
+            metavar="MB", type=int, default=500)
+    parser.add_argument('--compress-level',
+            help="the level used by rcc to compress resources where 0 is no "
+                    "compression [default: rcc's default]",
+            metavar="LEVEL", type=int, choices=range(10))
+    parser.add_argument('--compress-threshold',
+            help="the percentage reduction in the size of a resource file "
+                    "needed for rcc to store it compressed [default: rcc's "
+                    "default]",
+            metavar="PERCENT", type=int)
+    parser.add_argument('--cython',
+            help="the Cython executable [default: cython]",
+            metavar="EXECUTABLE")
+    parser.add_argument('--deferred-bundles',
+            help="the number of binary .rcc files containing the modules not "
+                    "imported when the application starts [default: 1]",
+            metavar="NUMBER", type=int, default=1)
+    parser.add_argument('--exclude-unreachable',
+            help="exclude frozen modules that are not imported by the "
+                    "application",
+            action='store_true')
+    parser.add_argument('--external-resources',
+            help="compile the resources to binary .rcc files to be installed "
+                    "with the executable",
+            action='store_true')
+    parser.add_argument('--import-stats',
+            help="always record statistics about the import of modules",
+            action='store_true')
     parser.add_argument('--include-dir',
             help="the target Python include directory", metavar="DIR")
     parser.add_argument('--interpreter',
             help="the host interpreter executable",
             metavar="EXECUTABLE")
+    parser.add_argument('--jobs',
+            help="the number of jobs to run at a time where 0 is the number "
+                    "of CPUs [default: 0]",
+            metavar="NUMBER", type=int, default=0)
+    parser.add_argument('--make',
+            help="run qmake and make (or ninja) to build the application",
+            action='store_true')
+    parser.add_argument('--ninja',
+            help="also generate a build.ninja file that builds the application "
+                    "without using make",
+            action='store_true')
     parser.add_argument('--no-clean',
             help="do not delete and re-create the build directory before "
                     "starting",
             dest='clean', default=True, action='store_false')
+    parser.add_argument('--no-compress',
+            help="a glob pattern matching the resource paths of files, or the "
+                    "names of modules and packages, that are never compressed",
+            metavar="PATTERN", action='append', default=[])
     parser.add_argument('--opt',
             help="the optimisation level where 0 is none, 1 is no asserts, 2 "
                     "is no asserts or docstrings [default: 2]",
             metavar="LEVEL", type=int, choices=range(3), default=2),
     parser.add_argument('--python-library', help="the target Python library",
             metavar="LIB")
+    parser.add_argument('--qmake',
+            help="the qmake executable used to generate the build.ninja file "
+                    "or to build the application [default: the sysroot's "
+                    "qmake or qmake]",
+            metavar="EXECUTABLE")
+    parser.add_argument('--report-unreachable',
+            help="report frozen modules that are not imported by the "
+                    "application",
+            action='store_true')
     parser.add_argument('--resources',
-            help="the number of .qrc resource files to generate [default: 1]",
-            metavar="NUMBER", type=int, default=1),
+            help="the number of .qrc resource files to generate or 'auto' to "
+                    "choose a number based on the size of the resources and "
+                    "the number of CPUs [default: 1]",
+            metavar="NUMBER", default='1'),
     parser.add_argument('--source-dir',
             help="the Python source code directory", metavar="DIR")
     parser.add_argument('--standard-library-dir',
             help="the target Python standard library directory", metavar="DIR")
+    parser.add_argument('--startup-modules',
+            help="the file containing the names of the modules imported when "
+                    "the application starts",
+            metavar="FILE")
     parser.add_argument('--sysroot', help="the system image root directory",
             metavar="DIR")
     parser.add_argument('--target', help="the target architecture"),
@@ -77,20 +145,72 @@ def main():
     # Perform the build.
     message_handler = MessageHandler(args.quiet, args.verbose)
 
-    if args.resources < 1:
+    if args.resources == 'auto':
+        nr_resources = 0
+    else:
+        try:
+            nr_resources = int(args.resources)
+        except ValueError:
+            nr_resources = 0
+
+        if nr_resources < 1:
+            message_handler.error(
+                    "error: argument --resources: number must be at least 1 "
+                    "or 'auto'")
+            return 2
+
+    if args.cache_size < 0:
         message_handler.error(
-                "error: argument --resources: number must be at least 1")
+                "error: argument --cache-size: size must be at least 0")
         return 2
 
+    if args.jobs < 0:
+        message_handler.error(
+                "error: argument --jobs: number must be at least 0")
+        return 2
+
+    threshold = args.compress_threshold
+
+    if threshold is not None and not 0 <= threshold <= 100:
+        message_handler.error(
+                "error: argument --compress-threshold: percentage must be "
+                "between 0 and 100")
+        return 2
+
+    if args.deferred_bundles < 1:
+        message_handler.error(
+                "error: argument --deferred-bundles: number must be at least "
+                "1")
+        return 2
+
+    if args.exclude_unreachable:
+        unreachable = 'exclude'
+    elif args.report_unreachable:
+        unreachable = 'report'
+    else:
+        unreachable = None
+
     try:
         builder = Builder(Project.load(args.project), args.target,
                 message_handler)
 
-        builder.build(args.opt, args.resources, args.clean, args.sysroot,
+        builder.build(args.opt, nr_resources, args.clean, args.sysroot,
                 build_dir=args.build_dir, include_dir=args.include_dir,
                 interpreter=args.interpreter,
                 python_library=args.python_library, source_dir=args.source_dir,
-                standard_library_dir=args.standard_library_dir)
+                standard_library_dir=args.standard_library_dir,
+                nr_jobs=args.jobs, cache_dir=args.cache_dir,
+                cache_size=args.cache_size * 1024 * 1024,
+                archive=args.archive, import_stats=args.import_stats,
+                unreachable=unreachable,
+                external_resources=args.external_resources,
+                startup_modules=args.startup_modules,
+                nr_deferred=args.deferred_bundles,
+                compress_level=args.compress_level,
+                compress_threshold=args.compress_threshold,
+                no_compress=args.no_compress, cython=args.cython,
+                ninja=args.ninja, qmake=args.qmake,
+                make=args.make)
     except UserException as e:
         message_handler.exception(e)
         return 1
@@ -38,8 +38,27 @@ def main():
     # Parse the command line.
     parser = argparse.ArgumentParser()
 
+    parser.add_argument('--cache-dir',
+            help="the directory containing a cache of the files installed by "
+                    "each component", metavar="DIR")
+    parser.add_argument('--cache-size',
+            help="the maximum size of the cache where 0 is no limit "
+                    "[default: 10240]",
+            metavar="MB", type=int, default=10240)
     parser.add_argument('--component', help="the component name to build",
             action='append')
+    parser.add_argument('--force',
+            help="re-create the system image root directory and build every "
+                    "component even if it is up to date",
+            action='store_true')
+    parser.add_argument('--jobs',
+            help="the number of jobs, shared by all components, to run at a "
+                    "time where 0 is the number of CPUs [default: 0]",
+            metavar="NUMBER", type=int, default=0)
+    parser.add_argument('--memory-per-job',
+            help="the megabytes of memory needed by each job, used to limit "
+                    "the number of jobs, where 0 is no limit [default: 1024]",
+            metavar="MB", type=int, default=1024)
     parser.add_argument('--no-clean',
             help="do not remove the temporary build directory",
             action='store_true')
@@ -69,6 +88,21 @@ def main():
     # Perform the required action.
     message_handler = MessageHandler(args.quiet, args.verbose)
 
+    if args.cache_size < 0:
+        message_handler.error(
+                "error: argument --cache-size: number must be at least 0")
+        return 2
+
+    if args.jobs < 0:
+        message_handler.error(
+                "error: argument --jobs: number must be at least 0")
+        return 2
+
+    if args.memory_per_job < 0:
+        message_handler.error(
+                "error: argument --memory-per-job: number must be at least 0")
+        return 2
+
     try:
         sysroot_dir = args.sysroot
         if not sysroot_dir:
@@ -80,7 +114,10 @@ def main():
         if args.options:
             sysroot.show_options(args.component)
         else:
-            sysroot.build_components(args.component, args.no_clean)
+            sysroot.build_components(args.component, args.no_clean,
+                    nr_jobs=args.jobs, memory_per_job=args.memory_per_job,
+                    force=args.force, cache_dir=args.cache_dir,
+                    cache_size=args.cache_size)
     except UserException as e:
         message_handler.exception(e)
         return 1
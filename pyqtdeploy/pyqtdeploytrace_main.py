@@ -0,0 +1,87 @@
+# Copyright (c) 2018, Riverbank Computing Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import argparse
+
+from . import (MessageHandler, Project, PYQTDEPLOY_RELEASE, Tracer,
+        UserException)
+
+
+def main():
+    """ The entry point for the setuptools generated pyqtdeploy-trace wrapper.
+    """
+
+    # Parse the command line.
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--interpreter',
+            help="the host interpreter executable",
+            metavar="EXECUTABLE")
+    parser.add_argument('--output',
+            help="write the names of the imported modules to a file",
+            metavar="FILE")
+    parser.add_argument('--session',
+            help="run the application with a set of command line arguments",
+            metavar="ARGS", action='append')
+    parser.add_argument('--update',
+            help="update the project to match the imported modules",
+            action='store_true')
+    parser.add_argument('--quiet', help="disable progress messages",
+            action='store_true')
+    parser.add_argument('--verbose', help="enable verbose progress messages",
+            action='store_true')
+    parser.add_argument('-V', '--version', action='version',
+            version=PYQTDEPLOY_RELEASE)
+    parser.add_argument('project', help="the project to trace")
+
+    args = parser.parse_args()
+
+    # Perform the trace.
+    message_handler = MessageHandler(args.quiet, args.verbose)
+
+    try:
+        tracer = Tracer(Project.load(args.project), message_handler)
+
+        imported = tracer.trace(args.interpreter, args.session or [''])
+
+        if args.output:
+            try:
+                with open(args.output, 'w') as f:
+                    for name in imported:
+                        f.write(name + '\n')
+            except OSError as e:
+                raise UserException(
+                        "Unable to write {0}".format(args.output), str(e))
+
+        stdlib_select, stdlib_deselect = tracer.compare(imported)
+
+        if args.update:
+            tracer.update(stdlib_select, stdlib_deselect)
+    except UserException as e:
+        message_handler.exception(e)
+        return 1
+
+    return 0
@@ -0,0 +1,166 @@
+# Copyright (c) 2018, Riverbank Computing Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import tarfile
+import tempfile
+import time
+
+
+class InstallCache:
+    """ Encapsulate a cache of the files installed by components.  Each entry
+    is a tar archive named after its key.  The cache may be shared by several
+    processes at the same time.  An entry is only ever created by atomically
+    renaming a completed temporary file, and an entry being read remains valid
+    even if another process replaces or evicts it.  When the cache is too big
+    the least recently used entries are evicted.
+    """
+
+    # The extension of an entry.
+    ENTRY_EXT = '.tar'
+
+    # The extension of a temporary file.
+    TEMP_EXT = '.tmp'
+
+    # The age in seconds after which a temporary file is assumed to have been
+    # abandoned.
+    TEMP_MAX_AGE = 24 * 60 * 60
+
+    def __init__(self, cache_dir, max_size=0):
+        """ Initialise the object.  max_size is the maximum size of the cache
+        in bytes where 0 means there is no limit.
+        """
+
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def restore(self, key, root_dir):
+        """ Extract the entry with the given key to a root directory and return
+        True if there was such an entry.
+        """
+
+        entry = self._entry_name(key)
+
+        try:
+            tf = tarfile.open(entry)
+        except FileNotFoundError:
+            return False
+        except tarfile.TarError:
+            # The entry is corrupt so make sure it is rebuilt.
+            self._remove(entry)
+            return False
+
+        with tf:
+            tf.extractall(root_dir)
+
+        # Mark the entry as recently used.
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        return True
+
+    def store(self, key, root_dir, names):
+        """ Create an entry with the given key containing a sequence of the
+        names of files relative to a root directory.
+        """
+
+        fd, temp_name = tempfile.mkstemp(suffix=self.TEMP_EXT,
+                dir=self.cache_dir)
+
+        try:
+            # Make sure the entry can be read by other users.
+            os.chmod(temp_name, 0o644)
+
+            with os.fdopen(fd, 'wb') as f:
+                with tarfile.open(fileobj=f, mode='w') as tf:
+                    for name in sorted(names):
+                        tf.add(os.path.join(root_dir, name), arcname=name,
+                                recursive=False)
+
+            # Any existing entry with the same key will have the same contents
+            # so it doesn't matter if it is replaced.
+            os.replace(temp_name, self._entry_name(key))
+        except:
+            self._remove(temp_name)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """ Remove the least recently used entries until the cache is no
+        bigger than its maximum size.  Abandoned temporary files are also
+        removed.
+        """
+
+        now = time.time()
+        entries = []
+        size = 0
+
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Another process has removed it.
+                continue
+
+            if name.endswith(self.TEMP_EXT):
+                if now - st.st_mtime > self.TEMP_MAX_AGE:
+                    self._remove(path)
+            elif name.endswith(self.ENTRY_EXT):
+                entries.append((st.st_mtime, st.st_size, path))
+                size += st.st_size
+
+        if self.max_size <= 0:
+            return
+
+        entries.sort()
+
+        while size > self.max_size and entries:
+            _, entry_size, path = entries.pop(0)
+            self._remove(path)
+            size -= entry_size
+
+    def _entry_name(self, key):
+        """ Return the name of the entry with the given key. """
+
+        return os.path.join(self.cache_dir, key + self.ENTRY_EXT)
+
+    @staticmethod
+    def _remove(path):
+        """ Remove a file ignoring any errors, e.g. because another process has
+        already removed it or (on Windows) it is being read.
+        """
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
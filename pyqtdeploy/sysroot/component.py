@@ -30,6 +30,10 @@ from abc import ABC, abstractmethod
 class ComponentBase(ABC):
     """ The base class for the implementation of a component plugin. """
 
+    # A sequence of the names of the components that must be built before this
+    # one.  Any that are not in the specification file are ignored.
+    dependencies = ()
+
     # A sequence of ComponentOption instances describing the options that can
     # be specified for the component in the specification file.  These are made
     # available as attributes of the plugin instance.
@@ -46,7 +50,7 @@ class ComponentBase(ABC):
 class ComponentOption:
     """ Encapsulate an option for the component in the specification file. """
 
-    def __init__(self, name, type=str, required=False, default=None, values=None, help=''):
+    def __init__(self, name, type=str, required=False, default=None, values=None, help='', file=False):
         """ Initialise the object. """
 
         self.name = name
@@ -55,6 +59,7 @@ class ComponentOption:
         self.default = default
         self.values = values
         self.help = help if help else "None available."
+        self.file = file
 
         if values:
             self.help += " The possible values are: {0}.".format(
@@ -0,0 +1,114 @@
+# Copyright (c) 2018, Riverbank Computing Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import select
+import shutil
+import tempfile
+
+
+class JobServer:
+    """ Encapsulate a GNU make compatible jobserver that shares a budget of
+    jobs between every make (and anything else that understands the protocol)
+    run while building a sysroot.  Each token in the pipe is permission to run
+    one job in addition to the one that every client is implicitly allowed.
+    """
+
+    def __init__(self, nr_jobs):
+        """ Initialise the object. """
+
+        # A named pipe is used so that we can have our own non-blocking file
+        # descriptor without changing the blocking file descriptors that make
+        # expects.
+        self._fifo_dir = tempfile.mkdtemp()
+        fifo = os.path.join(self._fifo_dir, 'jobserver')
+        os.mkfifo(fifo)
+
+        self._own_read_fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+
+        # Opening the read end for the clients must not block waiting for a
+        # writer so it is made blocking afterwards.  (Note that jobservers are
+        # not used on Windows where fcntl is not available.)
+        import fcntl
+
+        self._read_fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        flags = fcntl.fcntl(self._read_fd, fcntl.F_GETFL)
+        fcntl.fcntl(self._read_fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+
+        self._write_fd = os.open(fifo, os.O_WRONLY)
+
+        # The file descriptors must be passed to child processes.
+        os.set_inheritable(self._read_fd, True)
+        os.set_inheritable(self._write_fd, True)
+
+        self.release(nr_jobs - 1)
+
+    @property
+    def fds(self):
+        """ The file descriptors that must be passed to a client. """
+
+        return (self._read_fd, self._write_fd)
+
+    @property
+    def makeflags(self):
+        """ The value of MAKEFLAGS that makes GNU make a client. """
+
+        # Note that --jobserver-fds is understood by all versions of GNU make
+        # that support a jobserver.
+        return '-j --jobserver-fds={0},{1}'.format(self._read_fd,
+                self._write_fd)
+
+    def acquire(self):
+        """ Try to acquire a token without blocking and return True if one was
+        acquired.  If False is returned then the caller should try again
+        later.
+        """
+
+        readable, _, _ = select.select([self._own_read_fd], [], [], 0)
+
+        if not readable:
+            return False
+
+        # A client may have taken the token since the select().
+        try:
+            return len(os.read(self._own_read_fd, 1)) == 1
+        except BlockingIOError:
+            return False
+
+    def close(self):
+        """ Close the jobserver. """
+
+        os.close(self._own_read_fd)
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+        shutil.rmtree(self._fifo_dir, ignore_errors=True)
+
+    def release(self, nr_tokens=1):
+        """ Return a number of tokens to the jobserver. """
+
+        if nr_tokens > 0:
+            os.write(self._write_fd, b'+' * nr_tokens)
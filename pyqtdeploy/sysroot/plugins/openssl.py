@@ -36,9 +36,9 @@ class OpenSSLComponent(ComponentBase):
 
     # The component options.
     options = [
-        ComponentOption('python_source',
+        ComponentOption('python_source', file=True,
                 help="The archive of the Python source code containing patches to build OpenSSL on macOS."),
-        ComponentOption('source', required=True,
+        ComponentOption('source', required=True, file=True,
                 help="The archive containing the OpenSSL source code."),
     ]
 
@@ -30,9 +30,12 @@ from ... import ComponentBase, ComponentOption
 class pipComponent(ComponentBase):
     """ The pip meta-component. """
 
+    # The components that must be built first.
+    dependencies = ('python', )
+
     # The component options.
     options = [
-        ComponentOption('packages', type=list, required=True,
+        ComponentOption('packages', type=list, required=True, file=True,
                 help="The packages to be installed by pip."),
     ]
 
@@ -32,9 +32,12 @@ from ... import ComponentBase, ComponentOption
 class PyQt3DComponent(ComponentBase):
     """ The PyQt3D component. """
 
+    # The components that must be built first.
+    dependencies = ('pyqt5', )
+
     # The component options.
     options = [
-        ComponentOption('source', required=True,
+        ComponentOption('source', required=True, file=True,
                 help="The archive containing the PyQt3D source code."),
     ]
 
@@ -32,13 +32,16 @@ from ... import ComponentBase, ComponentOption
 class PyQt5Component(ComponentBase):
     """ The PyQt5 component. """
 
+    # The components that must be built first.
+    dependencies = ('python', 'qt5', 'sip')
+
     # The component options.
     options = [
         ComponentOption('disabled_features', type=list,
                 help="The features that are disabled."),
         ComponentOption('modules', type=list, required=True,
                 help="The extension modules to be built."),
-        ComponentOption('source', required=True,
+        ComponentOption('source', required=True, file=True,
                 help="The archive containing the PyQt5 source code."),
     ]
 
@@ -89,7 +92,8 @@ pyqt_modules = {6}
             sysroot.host_qmake, '--sysroot', sysroot.sysroot_dir, '--no-tools',
             '--no-qsci-api', '--no-designer-plugin', '--no-python-dbus',
             '--no-qml-plugin', '--no-stubs', '--configuration', cfg_name,
-            '--sip', sysroot.host_sip, '--confirm-license', '-c', '-j2']
+            '--sip', sysroot.host_sip, '--confirm-license', '-c', '-j',
+            str(sysroot.jobs)]
 
         if sysroot.verbose_enabled:
             args.append('--verbose')
@@ -32,9 +32,12 @@ from ... import ComponentBase, ComponentOption
 class PyQtChartComponent(ComponentBase):
     """ The PyQtChart component. """
 
+    # The components that must be built first.
+    dependencies = ('pyqt5', )
+
     # The component options.
     options = [
-        ComponentOption('source', required=True,
+        ComponentOption('source', required=True, file=True,
                 help="The archive containing the PyQtChart source code."),
     ]
 
@@ -32,9 +32,12 @@ from ... import ComponentBase, ComponentOption
 class PyQtDataVisualizationComponent(ComponentBase):
     """ The PyQtDataVisualization component. """
 
+    # The components that must be built first.
+    dependencies = ('pyqt5', )
+
     # The component options.
     options = [
-        ComponentOption('source', required=True,
+        ComponentOption('source', required=True, file=True,
                 help="The archive containing the PyQtDataVisualization source code."),
     ]
 
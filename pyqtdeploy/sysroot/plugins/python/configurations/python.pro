@@ -333,3 +333,14 @@ SOURCES += $$OBJECT_SOURCES
 SOURCES += $$PYTHON_SOURCES
 SOURCES += $$MODULE_SOURCES
 SOURCES += $$MOD_SOURCES
+
+# Write the sources that may be combined in a unity build if requested.
+defined(PY_UNITY_SOURCES_FILE, var) {
+    UNITY_SOURCES = $$PARSER_SOURCES $$OBJECT_SOURCES $$PYTHON_SOURCES $$MODULE_SOURCES $$MOD_SOURCES
+    write_file($$PY_UNITY_SOURCES_FILE, UNITY_SOURCES)|error("Unable to write $$PY_UNITY_SOURCES_FILE")
+}
+
+# Use any unity build configuration.
+exists(unity.pri) {
+    include(unity.pri)
+}
@@ -29,8 +29,13 @@ import shutil
 import sys
 
 from .... import ComponentBase, ComponentOption
+from ....metadata import (external_libraries_metadata,
+        get_extension_library_dir, get_extension_library_name,
+        get_extension_module_configuration, get_python_metadata)
+from ....platforms import Architecture
 
 from .configure_python import configure_python
+from .unity_build import configure_unity_build
 
 
 class PythonComponent(ComponentBase):
@@ -44,8 +49,14 @@ class PythonComponent(ComponentBase):
                 help="Build the target Python from source code rather than use an existing installation."),
         ComponentOption('dynamic_loading', type=bool,
                 help="Set to enable support for the dynamic loading of extension modules when building from source."),
-        ComponentOption('source', required=True,
+        ComponentOption('source', required=True, file=True,
                 help="The archive containing the Python source code."),
+        ComponentOption('static_extension_modules', type=list,
+                help="The names of the standard library extension modules to build as static libraries when building the target Python from source. Applications then link against the libraries rather than compile the modules themselves."),
+        ComponentOption('unity_build', type=int, default=0,
+                help="The number of translation units to combine the sources of the target Python into when building from source. 0 means that each source is compiled individually."),
+        ComponentOption('unity_build_exclude', type=list,
+                help="The names of source files, relative to the Python source directory, that are always compiled individually in a unity build."),
     ]
 
     def build(self, sysroot):
@@ -106,6 +117,17 @@ class PythonComponent(ComponentBase):
                 sysroot.error(
                         "using an existing Python installation is not supported for {0}".format(sysroot.target_arch_name))
 
+            if self.static_extension_modules:
+                sysroot.error(
+                        "static extension modules can only be built when building the target Python from source")
+
+    @property
+    def dependencies(self):
+        """ The components that must be built first. """
+
+        # qmake is needed to build the target Python from source.
+        return ('qt5', ) if self.build_target_from_source else ()
+
     def configure(self, sysroot):
         """ Complete the configuration of the component. """
 
@@ -197,17 +219,110 @@ class PythonComponent(ComponentBase):
         # Configure for the target.
         configure_python(self.dynamic_loading, sysroot)
 
+        if self.unity_build > 0:
+            configure_unity_build(self.unity_build, self.unity_build_exclude,
+                    sysroot)
+
         # Do the build.
         sysroot.run(sysroot.host_qmake, 'SYSROOT=' + sysroot.sysroot_dir)
         sysroot.run(sysroot.host_make)
         sysroot.run(sysroot.host_make, 'install')
 
+        # Build any extension module libraries.
+        if self.static_extension_modules:
+            self._build_extension_libraries(sysroot)
+
         # Create a platform-specific dummy _sysconfigdata module.  This allows
         # the sysconfig module to work.  If necessary we can populate it with
         # genuinely useful information if people ask for it.
         if sysroot.target_platform_name != 'win':
             self._create_sysconfigdata(sysroot)
 
+    def _build_extension_libraries(self, sysroot):
+        """ Build the static libraries of the standard library extension
+        modules.  Note that the names of the libraries (as determined by the
+        configuration used to build them) must match those expected by the
+        builder.
+        """
+
+        target = Architecture.architecture(sysroot.target_arch_name)
+        version = sysroot.decode_version_nr(sysroot.target_py_version_nr)
+        metadata = get_python_metadata(version)
+
+        lib_dir = get_extension_library_dir(sysroot.target_lib_dir, version)
+        sysroot.create_dir(lib_dir, empty=True)
+
+        src_dir = os.getcwd().replace('\\', '/')
+        modules_dir = src_dir + '/Modules'
+
+        for name in self.static_extension_modules:
+            module = metadata.get(name)
+
+            if module is None or not module.source:
+                sysroot.error(
+                        "'{0}' is not a standard library extension module".format(name))
+
+            if not target.is_targeted(module.target):
+                sysroot.progress(
+                        "Skipping {0} as it is not supported by {1}".format(
+                                name, sysroot.target_arch_name))
+                continue
+
+            configuration = get_extension_module_configuration(module, target)
+            sources, defines, includepath = configuration
+
+            # Use the default configuration of any external library.
+            xlib_configuration = None
+            xlib_includepath = []
+
+            if module.xlib is not None:
+                for xlib in external_libraries_metadata:
+                    if xlib.name == module.xlib:
+                        xlib_configuration = (xlib.defines, xlib.includepath)
+                        defines += tuple(xlib.defines.split())
+                        xlib_includepath = xlib.includepath.replace('$SYSROOT',
+                                sysroot.sysroot_dir).split()
+                        break
+
+            lib_name = get_extension_library_name(name, target, configuration,
+                    xlib_configuration)
+
+            sysroot.progress("Building the static library for {0}".format(name))
+
+            build_dir = os.path.join('pdy-extensions', name)
+            sysroot.create_dir(build_dir, empty=True)
+
+            pro = sysroot.create_file(os.path.join(build_dir, name + '.pro'))
+
+            pro.write('TEMPLATE = lib\n')
+            pro.write('CONFIG += staticlib warn_off\n')
+            pro.write('CONFIG -= qt\n')
+            pro.write('TARGET = {0}\n'.format(lib_name))
+            pro.write('DESTDIR = {0}\n'.format(lib_dir.replace('\\', '/')))
+
+            if defines:
+                pro.write('DEFINES += {0}\n'.format(' '.join(defines)))
+
+            incpath = [sysroot.target_py_include_dir.replace('\\', '/'),
+                    modules_dir]
+            incpath.extend([modules_dir + '/' + i for i in includepath])
+            incpath.extend([i.replace('\\', '/') for i in xlib_includepath])
+
+            if sysroot.target_platform_name == 'win':
+                incpath.append(src_dir + '/PC')
+
+            pro.write('INCLUDEPATH += {0}\n'.format(' '.join(incpath)))
+            pro.write('SOURCES += {0}\n'.format(
+                    ' '.join([modules_dir + '/' + s for s in sources])))
+
+            pro.close()
+
+            old_wd = os.getcwd()
+            os.chdir(build_dir)
+            sysroot.run(sysroot.host_qmake)
+            sysroot.run(sysroot.host_make)
+            os.chdir(old_wd)
+
     def _create_sysconfigdata(self, sysroot):
         """ Create the _sysconfigdata module. """
 
@@ -0,0 +1,275 @@
+# Copyright (c) 2018, Riverbank Computing Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+
+import os
+import re
+
+
+# The sources that are never combined.  They are either so large that there is
+# nothing to gain or they include platform-specific code that defines names
+# that the scan below cannot see.
+_ALWAYS_EXCLUDED = (
+    'Modules/config.c',
+    'Modules/main.c',
+    'Objects/obmalloc.c',
+    'Python/Python-ast.c',
+    'Python/ceval.c',
+    'Python/dtoa.c',
+    'Python/graminit.c',
+    'Python/thread.c',
+)
+
+# The regular expressions used to scan a source file.
+_DEFINE_RE = re.compile(r'^\s*#\s*define\s+(\w+)', re.MULTILINE)
+_UNDEF_RE = re.compile(r'^\s*#\s*undef\s+(\w+)', re.MULTILINE)
+_INCLUDE_RE = re.compile(r'^\s*#\s*include\s+"([^"]+)"', re.MULTILINE)
+_IDENTIFIER_RE = re.compile(r'\b([A-Za-z_]\w*)\b')
+_PY_ID_RE = re.compile(r'\b_Py_IDENTIFIER\(\s*(\w+)\s*\)')
+_PY_STATIC_STRING_RE = re.compile(r'\b_Py_static_string\(\s*(\w+)\s*,')
+_PYDOC_STRVAR_RE = re.compile(r'\bPyDoc_STRVAR\(\s*(\w+)\s*,')
+_PY_LOCAL_RE = re.compile(r'^Py_LOCAL(?:_INLINE)?\s*\([^)]*\)\s*(\w+)',
+        re.MULTILINE)
+_STATIC_RE = re.compile(r'^static\b([^;{]*)', re.MULTILINE)
+_STATIC_NAME_RE = re.compile(r'(\w+)\s*(?:\[[^\]]*\]\s*)*[(=;,\[]')
+_TAG_RE = re.compile(r'^(?:typedef\s+)?(?:struct|union|enum)\s+(\w+)',
+        re.MULTILINE)
+_TYPEDEF_END_RE = re.compile(r'^}\s*(\w+)\s*;', re.MULTILINE)
+_TYPEDEF_RE = re.compile(r'^typedef\b[^;{]*?\b(\w+)\s*;', re.MULTILINE)
+
+
+def configure_unity_build(nr_units, exclude, sysroot):
+    """ Configure a unity build of the target Python in the current directory
+    (containing the Python source code and python.pro).  The sources are
+    combined into at most nr_units translation units.  exclude is a sequence
+    of source files (relative to the source directory) that are compiled
+    individually.  Sources that appear to define the same file scope names,
+    that define macros used by another, or that define different macros
+    before including any header file (eg. PY_SSIZE_T_CLEAN) are not combined.
+    """
+
+    sysroot.progress(
+            "Configuring a unity build with {0} translation units".format(
+                    nr_units))
+
+    # Get python.pro to tell us the sources it would compile.
+    sources_file = 'unity_sources.txt'
+    sysroot.run(sysroot.host_qmake, 'SYSROOT=' + sysroot.sysroot_dir,
+            'PY_UNITY_SOURCES_FILE=' + sources_file)
+
+    with open(sources_file) as f:
+        sources = [s for s in f.read().split() if s]
+
+    excluded = set(_ALWAYS_EXCLUDED)
+    excluded.update([e.replace('\\', '/') for e in exclude])
+
+    # Scan each source file.
+    scanned = []
+
+    for source in sources:
+        if source in excluded:
+            continue
+
+        scanned_source = _ScannedSource(source)
+        if scanned_source.names is None:
+            sysroot.progress(
+                    "{0} will be compiled individually".format(source))
+            continue
+
+        scanned.append(scanned_source)
+
+    # Place the largest sources first, each in the smallest unit that it
+    # doesn't conflict with.
+    units = [_TranslationUnit() for _ in range(nr_units)]
+
+    for scanned_source in sorted(scanned, key=lambda s: (-s.size, s.source)):
+        for unit in sorted(units, key=lambda u: u.size):
+            if unit.add(scanned_source):
+                break
+        else:
+            sysroot.progress(
+                    "{0} will be compiled individually".format(
+                            scanned_source.source))
+
+    # Write the translation units and the qmake include file that uses them.
+    sysroot.create_dir('unity', empty=True)
+
+    unity_sources = []
+    combined = []
+
+    for nr, unit in enumerate(units):
+        # There is no point in a translation unit of a single source file.
+        if len(unit.sources) < 2:
+            continue
+
+        unity_source = 'unity/python_unity_{0}.c'.format(nr)
+        unity_sources.append(unity_source)
+
+        unit_f = sysroot.create_file(unity_source)
+        unit_f.write('/* Automatically generated. */\n\n')
+
+        for source in sorted(unit.sources, key=sources.index):
+            unit_f.write('#include "../{0}"\n'.format(source))
+            combined.append(source)
+
+        unit_f.close()
+
+    pri_f = sysroot.create_file('unity.pri')
+    pri_f.write('# Automatically generated.\n\n')
+
+    if combined:
+        pri_f.write('SOURCES -= {0}\n'.format(' '.join(sorted(combined))))
+        pri_f.write('SOURCES += {0}\n'.format(' '.join(unity_sources)))
+
+    pri_f.close()
+
+
+class _ScannedSource:
+    """ Encapsulate the names defined and used by a source file. """
+
+    def __init__(self, source):
+        """ Initialise the object by scanning the source file.  names will be
+        None if the file cannot be combined with others.
+        """
+
+        self.source = source
+        self.size = os.path.getsize(source)
+
+        # The set of file scope names defined.
+        self.names = None
+
+        # The set of macros defined (and not undefined).
+        self.macros = None
+
+        # The set of identifiers used.
+        self.identifiers = None
+
+        # The set of macros defined before including any header file.  These
+        # must be the same for all the sources in a translation unit.
+        self.prologue = None
+
+        text = self._read_source(source)
+        if text is None:
+            return
+
+        names = set()
+
+        for match in _STATIC_RE.finditer(text):
+            # The name may be on the following line.
+            declaration = match.group(1)
+            if not _STATIC_NAME_RE.search(declaration):
+                declaration += text[match.end():match.end() + 200]
+
+            name_match = _STATIC_NAME_RE.search(declaration)
+            if name_match:
+                names.add(name_match.group(1))
+
+        names.update(['PyId_' + i for i in _PY_ID_RE.findall(text)])
+
+        # Names defined by macros that expand to static definitions.
+        names.update(_PY_STATIC_STRING_RE.findall(text))
+        names.update(_PYDOC_STRVAR_RE.findall(text))
+        names.update(_PY_LOCAL_RE.findall(text))
+        names.update(_TAG_RE.findall(text))
+        names.update(_TYPEDEF_END_RE.findall(text))
+        names.update(_TYPEDEF_RE.findall(text))
+
+        first_include = re.search(r'^\s*#\s*include\b', text, re.MULTILINE)
+        prologue = text[:first_include.start()] if first_include else text
+
+        self.names = names
+        self.prologue = frozenset(_DEFINE_RE.findall(prologue))
+        self.identifiers = set(_IDENTIFIER_RE.findall(text))
+
+        # Prologue macros are redefined by each source so don't conflict.
+        self.macros = set(_DEFINE_RE.findall(text)) - set(
+                _UNDEF_RE.findall(text)) - self.prologue
+
+    @classmethod
+    def _read_source(cls, source):
+        """ Return the text of a source file followed by the text of any
+        argument clinic (ie. .c.h) files that it includes.  None is returned
+        if it includes other code that may define names.
+        """
+
+        with open(source, encoding='latin-1') as f:
+            text = f.read()
+
+        for include in _INCLUDE_RE.findall(text):
+            if include.endswith('.c.h'):
+                included = os.path.join(os.path.dirname(source), include)
+
+                if not os.path.isfile(included):
+                    return None
+
+                included_text = cls._read_source(included)
+                if included_text is None:
+                    return None
+
+                text += '\n' + included_text
+            elif include.endswith('.c') or 'stringlib/' in include:
+                return None
+
+        return text
+
+
+class _TranslationUnit:
+    """ Encapsulate a translation unit of combined source files. """
+
+    def __init__(self):
+        """ Initialise the object. """
+
+        self.size = 0
+        self.sources = []
+
+        self._names = set()
+        self._macros = set()
+        self._identifiers = set()
+        self._prologue = None
+
+    def add(self, scanned):
+        """ Add a scanned source file to the unit if it doesn't conflict with
+        those already added.  Return True if it was added.
+        """
+
+        if self._prologue is not None and self._prologue != scanned.prologue:
+            return False
+
+        if scanned.names & self._names:
+            return False
+
+        if scanned.macros & self._identifiers or self._macros & scanned.identifiers:
+            return False
+
+        self.size += scanned.size
+        self.sources.append(scanned.source)
+
+        self._names.update(scanned.names)
+        self._macros.update(scanned.macros)
+        self._identifiers.update(scanned.identifiers)
+        self._prologue = scanned.prologue
+
+        return True
@@ -33,6 +33,9 @@ from ... import ComponentBase, ComponentOption
 class Qt5Component(ComponentBase):
     """ The Qt5 component. """
 
+    # The components that must be built first.
+    dependencies = ('openssl', )
+
     # The component options.
     options = [
         ComponentOption('configure_options', type=list,
@@ -47,7 +50,7 @@ class Qt5Component(ComponentBase):
                 help="Enable SSL support."),
         ComponentOption('skip', type=list,
                 help="The Qt modules to skip when building from source."),
-        ComponentOption('source',
+        ComponentOption('source', file=True,
                 help="The archive containing the Qt5 source code if an existing installation is not to be used."),
         ComponentOption('static_msvc_runtime', type=bool,
                 help="Set if the MSVC runtime should be statically linked."),
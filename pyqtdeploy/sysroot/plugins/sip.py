@@ -32,9 +32,12 @@ from ... import ComponentBase, ComponentOption
 class SIPComponent(ComponentBase):
     """ The SIP component. """
 
+    # The components that must be built first.
+    dependencies = ('python', 'qt5')
+
     # The component options.
     options = [
-        ComponentOption('source', required=True,
+        ComponentOption('source', required=True, file=True,
                 help="The archive containing the SIP source code."),
     ]
 
@@ -24,21 +24,32 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import glob
+import hashlib
+import json
+import multiprocessing
 import os
 import shutil
 import subprocess
 import sys
+import tarfile
+import tempfile
 
 from ..file_utilities import (copy_embedded_file as fu_copy_embedded_file,
         create_file as fu_create_file, extract_version as fu_extract_version,
         get_embedded_dir as fu_get_embedded_dir,
         get_embedded_file_for_version as fu_get_embedded_file_for_version,
         open_file as fu_open_file, parse_version as fu_parse_version)
+from ..message_handler import MessageHandler
 from ..platforms import Architecture
 from ..user_exception import UserException
+from ..version import PYQTDEPLOY_RELEASE
 from ..windows import get_py_install_path
 
+from .cache import InstallCache
+from .component import ComponentBase
+from .jobserver import JobServer
 from .specification import Specification
 
 
@@ -56,6 +67,8 @@ class Sysroot:
 
         self.sysroot_dir = os.path.abspath(sysroot_dir)
         self._build_dir = os.path.join(self.sysroot_dir, 'build')
+        self._archives_dir = os.path.join(self._build_dir, 'archives')
+        self._stamps_dir = os.path.join(self.sysroot_dir, 'stamps')
 
         self._specification = Specification(sysroot_json, plugin_dirs,
                 self._target)
@@ -63,48 +76,125 @@ class Sysroot:
 
         self._source_dir = os.path.abspath(source_dir) if source_dir else os.path.dirname(os.path.abspath(sysroot_json))
 
+        # Save the arguments needed to re-create the sysroot in another
+        # process.
+        if plugin_dirs:
+            plugin_dirs = [os.path.abspath(d) for d in plugin_dirs]
+
+        self._process_args = (self.sysroot_dir, os.path.abspath(sysroot_json),
+                plugin_dirs, self._source_dir, self._target.name)
+
         self._target_py_version_nr = None
         self._host_qmake = None
 
+        # The files used by the component currently being built.
+        self._used_files = set()
+        self._file_hashes = {}
+
+        # Whether files can be cloned, i.e. copied so that they share their
+        # data until either is changed.  None means that it isn't yet known.
+        self._can_clone_files = None
+
+        # The hashes of the archives that have been unpacked.
+        self._unpacked_archives = set()
+
+        # Any cache of the files installed by components.
+        self._cache = None
+        self._cache_keys = {}
+        self._toolchain_identity = None
+
+        # The job budget.
+        self._nr_jobs = 1
+        self._make_args = ()
+        self._pass_fds = ()
+        self._jobserver = None
+        self._saved_makeflags = None
+
         self._target.configure()
         self._building_for_target = True
 
-    def build_components(self, component_names, no_clean):
-        """ Build a sequence of components.  If no names are given then create
-        the system image root directory and build everything.  Raise a
-        UserException if there is an error.
+    def build_components(self, component_names, no_clean, nr_jobs=1, memory_per_job=0, force=False, cache_dir=None, cache_size=0):
+        """ Build a sequence of components.  If no names are given then build
+        every component that is out of date, i.e. those whose options, source
+        archives or plugins have changed since they were last built and those
+        that depend on them.  If force is set, or the system image root
+        directory cannot be updated, then create the system image root
+        directory and build everything.  nr_jobs is the number of jobs, shared
+        by all components, to run at a time where 0 means the number of CPUs.
+        memory_per_job is the number of megabytes of memory needed by each job
+        and is used to limit the number of jobs to the amount of physical
+        memory.  0 means there is no limit.  Components are built,
+        concurrently if the number of jobs allows, once all the components
+        they depend on have been built.  If cache_dir is specified then it is
+        the name of a directory containing a cache, of no more than cache_size
+        megabytes (where 0 means there is no limit), of the files installed by
+        each component.  A component found in the cache is restored rather
+        than built.  Raise a UserException if there is an error.
         """
 
-        # Handle the options now we know they are needed.
-        self._specification.parse_options()
+        self._configure_components()
 
-        # Allow the components to configure themselves even if they are not
-        # being built.
-        for component in self.components:
-            component.configure(self)
+        if cache_dir:
+            try:
+                self._cache = InstallCache(cache_dir,
+                        max_size=cache_size * 1024 * 1024)
+            except OSError as e:
+                self.error("unable to create the cache directory", str(e))
 
         if component_names:
             components = self._components_from_names(component_names)
         else:
-            components = self.components
-            self.create_dir(self.sysroot_dir, empty=True)
-            os.makedirs(self.host_bin_dir)
-            os.makedirs(self.target_include_dir)
-            os.makedirs(self.target_lib_dir)
-            os.makedirs(self.target_src_dir)
+            components = None
+
+            if not force:
+                components = self._get_out_of_date_components()
+
+                if components is not None and len(components) == 0:
+                    self.progress("The system image root directory is up to date")
+                    return
+
+            if components is None:
+                components = self.components
+                self.create_dir(self.sysroot_dir, empty=True)
+                os.makedirs(self.host_bin_dir)
+                os.makedirs(self.target_include_dir)
+                os.makedirs(self.target_lib_dir)
+                os.makedirs(self.target_src_dir)
 
         # Create a new build directory.
         self.create_dir(self._build_dir, empty=True)
-        cwd = os.getcwd()
 
         # Build the components.
-        for component in components:
-            os.chdir(self._build_dir)
-            component.build(self)
+        nr_jobs = self._get_nr_jobs(nr_jobs, memory_per_job)
+        dependencies = self._get_dependencies(components)
+
+        # The files installed by concurrently built components cannot be told
+        # apart so the components must be built one at a time if they are
+        # being cached.
+        if self._cache is not None and nr_jobs > 1 and len(components) > 1:
+            self.verbose(
+                    "Building the components one at a time because they are "
+                    "being cached")
+            concurrent = False
+        else:
+            concurrent = (nr_jobs > 1 and len(components) > 1)
 
-        # Remove the build directory if requested.
-        os.chdir(cwd)
+        if not concurrent:
+            self._set_job_budget(nr_jobs)
+            cwd = os.getcwd()
+
+            try:
+                for component in self._sort_components(components,
+                        dependencies):
+                    self._build_component(component)
+            finally:
+                os.chdir(cwd)
+                self._set_job_budget(None)
+        else:
+            self._build_components_concurrently(components, dependencies,
+                    nr_jobs)
 
+        # Remove the build directory if requested.
         if not no_clean:
             self.delete_dir(self._build_dir)
 
@@ -121,6 +211,777 @@ class Sysroot:
 
         self._specification.show_options(components, self._message_handler)
 
+    def _build_component(self, component):
+        """ Build a component in its own build directory, or restore it from
+        any cache, and record its stamp.
+        """
+
+        # Make sure the component is out of date if the build fails.
+        stamp_file = self._get_stamp_file(component)
+        if os.path.exists(stamp_file):
+            os.remove(stamp_file)
+
+        # Get the keys before the component has a chance to change anything.
+        key = self._get_stamp_key(component)
+
+        if self._cache is not None:
+            cache_key = self._get_cache_key(component)
+
+            try:
+                restored = self._cache.restore(cache_key, self.sysroot_dir)
+            except (OSError, tarfile.TarError) as e:
+                self.error(
+                        "unable to restore {0} from the cache".format(
+                                component.name),
+                        str(e))
+
+            if restored:
+                self.progress(
+                        "Restored {0} from the cache".format(component.name))
+
+                self._used_files = set()
+                for names in self._get_option_files(component).values():
+                    self._used_files.update(names)
+                self._write_stamp(component, key)
+
+                return
+
+            installed = self._snapshot_sysroot()
+
+        build_dir = os.path.join(self._build_dir, component.name)
+        self.create_dir(build_dir, empty=True)
+        os.chdir(build_dir)
+
+        self._used_files = set()
+        component.build(self)
+
+        if self._cache is not None:
+            # Cache the files that the component installed.
+            names = [name
+                    for name, state in self._snapshot_sysroot().items()
+                            if installed.get(name) != state]
+
+            try:
+                self._cache.store(cache_key, self.sysroot_dir, names)
+            except (OSError, tarfile.TarError) as e:
+                # The build has succeeded so just warn.
+                self.progress(
+                        "Unable to add {0} to the cache: {1}".format(
+                                component.name, e))
+
+        self._write_stamp(component, key)
+
+    def _build_components_concurrently(self, components, dependencies, nr_jobs):
+        """ Build a sequence of components, each in a separate process,
+        sharing a budget of nr_jobs jobs.
+        """
+
+        # Check there are no circular dependencies before starting anything.
+        self._sort_components(components, dependencies)
+
+        nr_workers = min(nr_jobs, len(components))
+
+        # Without a jobserver each component gets an equal share of the
+        # budget.
+        jobserver = self._set_job_budget(nr_jobs, max(1, nr_jobs // nr_workers))
+
+        pending = list(components)
+        running = {}
+        built = set()
+        error = None
+
+        message_handler = self._message_handler
+        job_state = (self._nr_jobs, self._make_args, self._pass_fds)
+
+        # Make sure that any jobserver is inherited by the worker processes.
+        executor_kwargs = {}
+        if jobserver is not None and sys.version_info >= (3, 7):
+            executor_kwargs['mp_context'] = multiprocessing.get_context('fork')
+
+        try:
+            with ProcessPoolExecutor(max_workers=nr_workers, **executor_kwargs) as executor:
+                while pending or running:
+                    # Start any components whose dependencies have been built
+                    # unless something has already failed.  Every component
+                    # after the first needs a token from any jobserver.
+                    waiting = False
+
+                    if error is None:
+                        for component in list(pending):
+                            if len(running) == nr_workers:
+                                break
+
+                            if not dependencies[component.name] <= built:
+                                continue
+
+                            has_token = False
+
+                            if jobserver is not None and running:
+                                if not jobserver.acquire():
+                                    waiting = True
+                                    break
+
+                                has_token = True
+
+                            pending.remove(component)
+
+                            self.verbose(
+                                    "Starting the build of {0}".format(
+                                            component.name))
+
+                            future = executor.submit(_build_in_process,
+                                    self._process_args, message_handler.quiet,
+                                    message_handler.verbose, job_state,
+                                    component.name)
+                            running[future] = (component, has_token)
+
+                    if not running:
+                        break
+
+                    # If a component is waiting for a token then poll for
+                    # one.
+                    finished, _ = wait(running,
+                            timeout=(1.0 if waiting else None),
+                            return_when=FIRST_COMPLETED)
+
+                    for future in finished:
+                        component, has_token = running.pop(future)
+
+                        if has_token:
+                            jobserver.release()
+
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = (
+                                    "building {0} failed".format(
+                                            component.name),
+                                    str(e))
+
+                        if result is None:
+                            built.add(component.name)
+                            self.verbose(
+                                    "Finished the build of {0}".format(
+                                            component.name))
+                        elif error is None:
+                            error = result
+        finally:
+            self._set_job_budget(None)
+
+        if error is not None:
+            self.error(*error)
+
+    def _configure_components(self):
+        """ Parse the components' options and configure them. """
+
+        # Handle the options now we know they are needed.
+        self._specification.parse_options()
+
+        # Allow the components to configure themselves even if they are not
+        # being built.
+        for component in self.components:
+            component.configure(self)
+
+    def _get_out_of_date_components(self):
+        """ Return a sequence of the components that are out of date or None
+        if the system image root directory must be re-created.
+        """
+
+        if not os.path.isdir(self._stamps_dir):
+            return None
+
+        # Any component that has been removed from the specification may have
+        # left files that we have no way of removing.
+        names = set([component.name for component in self.components])
+
+        for stamp_name in os.listdir(self._stamps_dir):
+            name, ext = os.path.splitext(stamp_name)
+
+            if ext == '.json' and name not in names:
+                self.verbose(
+                        "Re-creating the system image root directory because "
+                        "'{0}' has been removed".format(name))
+                return None
+
+        components = self.components
+        dependencies = self._get_dependencies(components)
+        out_of_date = set()
+
+        for component in self._sort_components(components, dependencies):
+            if dependencies[component.name] & out_of_date:
+                reason = "a component it depends on is out of date"
+            else:
+                reason = self._check_stamp(component)
+
+            if reason:
+                self.verbose(
+                        "'{0}' is out of date because {1}".format(
+                                component.name, reason))
+                out_of_date.add(component.name)
+
+        return [component for component in components
+                if component.name in out_of_date]
+
+    def _check_stamp(self, component):
+        """ Return the reason why a component's stamp is invalid or None if it
+        is valid.
+        """
+
+        stamp = self._read_stamp(component)
+        if stamp is None:
+            return "it has not been built"
+
+        if stamp.get('key') != self._get_stamp_key(component):
+            return "its options, target, plugin or dependencies have changed"
+
+        for used_file in stamp.get('files', []):
+            name = used_file['name']
+
+            if not os.path.isfile(name):
+                return "'{0}' no longer exists".format(name)
+
+            # Avoid hashing (possibly very large) archives unless they appear
+            # to have changed.
+            st = os.stat(name)
+            if st.st_size == used_file['size'] and st.st_mtime == used_file['mtime']:
+                continue
+
+            if self._hash_file(name) != used_file['sha256']:
+                return "'{0}' has changed".format(name)
+
+        return None
+
+    def _get_stamp_file(self, component):
+        """ Return the name of a component's stamp file. """
+
+        return os.path.join(self._stamps_dir, component.name + '.json')
+
+    def _get_stamp_key(self, component):
+        """ Return the key of a component's stamp that captures everything,
+        apart from the files it uses, that affects how it is built.
+        """
+
+        key = self._get_component_identity(component)
+
+        # The stamps of the components it depends on.
+        stamps = {}
+        for dependency in self._get_spec_dependencies(component):
+            stamp = self._read_stamp(dependency)
+            stamps[dependency.name] = None if stamp is None else stamp['digest']
+
+        key['dependencies'] = stamps
+
+        return self._hash_key(key)
+
+    def _get_cache_key(self, component):
+        """ Return the key of a component in the cache.  Unlike the key of a
+        stamp it does not depend on where the source archives are, but does
+        depend on the host toolchain.
+        """
+
+        cache_key = self._cache_keys.get(component.name)
+
+        if cache_key is None:
+            key = self._get_component_identity(component)
+
+            key['toolchain'] = self._get_toolchain_identity()
+
+            # The installed files (eg. qmake, .prl files and the host Python)
+            # contain the absolute pathname of the system image root directory
+            # so they cannot be restored anywhere else.
+            key['sysroot'] = self.sysroot_dir
+
+            # The contents of any files named by the component's options.
+            key['files'] = {
+                    option_name: [self._hash_file(name) for name in names]
+                            for option_name, names in self._get_option_files(
+                                    component).items()}
+
+            # The cache keys of the components it depends on.
+            key['dependencies'] = {
+                    dependency.name: self._get_cache_key(dependency)
+                            for dependency in self._get_spec_dependencies(
+                                    component)}
+
+            cache_key = self._hash_key(key)
+            self._cache_keys[component.name] = cache_key
+
+        return cache_key
+
+    def _get_component_identity(self, component):
+        """ Return a dict that identifies a component's options and plugin
+        for the current target.
+        """
+
+        # The values of the component's options.
+        options = {}
+        plugin_files = set()
+
+        for cls in type(component).__mro__:
+            if cls is ComponentBase:
+                break
+
+            for option in cls.__dict__.get('options', []):
+                if option.name not in options:
+                    options[option.name] = getattr(component, option.name)
+
+            # The plugin is identified by the contents of the files that
+            # implement it.
+            for value in cls.__dict__.values():
+                code = getattr(value, '__code__', None)
+                if code is not None:
+                    plugin_files.add(code.co_filename)
+
+        plugins = []
+        for plugin_file in plugin_files:
+            try:
+                plugins.append(self._hash_file(plugin_file))
+            except OSError:
+                pass
+
+        return {
+            'pyqtdeploy': PYQTDEPLOY_RELEASE,
+            'target': self._target.name,
+            'options': options,
+            'plugins': sorted(plugins),
+        }
+
+    def _get_option_files(self, component):
+        """ Return a dict, keyed by option name, of the lists of the names of
+        the files (typically source archives) that a component's file options
+        refer to.
+        """
+
+        files = {}
+        seen = set()
+
+        for cls in type(component).__mro__:
+            if cls is ComponentBase:
+                break
+
+            for option in cls.__dict__.get('options', []):
+                # An option may be re-implemented by a sub-class.
+                if option.name in seen:
+                    continue
+
+                seen.add(option.name)
+
+                if not option.file:
+                    continue
+
+                value = getattr(component, option.name)
+                if value is None:
+                    value = []
+                elif isinstance(value, str):
+                    value = [value] if value else []
+
+                names = []
+
+                for v in value:
+                    try:
+                        name = self.find_file(v, required=False)
+                    except UserException:
+                        name = None
+
+                    if name is not None and os.path.isfile(name):
+                        names.append(name)
+
+                files[option.name] = names
+
+        return files
+
+    def _get_spec_dependencies(self, component):
+        """ Return a sequence of the components in the specification that a
+        component depends on.
+        """
+
+        dependencies = []
+
+        for name in component.dependencies:
+            dependency = self.find_component(name, required=False)
+            if dependency is not None:
+                dependencies.append(dependency)
+
+        return dependencies
+
+    def _get_toolchain_identity(self):
+        """ Return a dict that identifies the host toolchain. """
+
+        if self._toolchain_identity is None:
+            identity = {'host': self._host.name}
+
+            for name in ('CC', 'CXX', 'ANDROID_NDK_ROOT',
+                    'ANDROID_NDK_PLATFORM', 'ANDROID_NDK_TOOLCHAIN_VERSION',
+                    'IPHONEOS_DEPLOYMENT_TARGET', 'MACOSX_DEPLOYMENT_TARGET'):
+                identity[name] = os.environ.get(name)
+
+            # The version of the C++ compiler.  MSVC writes its banner to
+            # stderr when it is run without arguments.
+            if self._host.platform.name == 'win':
+                args = ['cl']
+            else:
+                args = [os.environ.get('CXX', 'c++'), '--version']
+
+            try:
+                identity['compiler'] = subprocess.run(args,
+                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                        universal_newlines=True).stdout.strip()
+            except OSError:
+                identity['compiler'] = None
+
+            self._toolchain_identity = identity
+
+        return self._toolchain_identity
+
+    @staticmethod
+    def _hash_key(key):
+        """ Return the hash of a dict used as a key. """
+
+        return hashlib.sha256(
+                json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _hash_file(self, name):
+        """ Return the SHA256 hash of a file's contents. """
+
+        # Source archives can be very big so avoid hashing them more than once.
+        st = os.stat(name)
+        memo_key = (name, st.st_size, st.st_mtime_ns)
+
+        digest = self._file_hashes.get(memo_key)
+
+        if digest is None:
+            hasher = hashlib.sha256()
+
+            with open(name, 'rb') as f:
+                while True:
+                    data = f.read(1024 * 1024)
+                    if not data:
+                        break
+
+                    hasher.update(data)
+
+            digest = hasher.hexdigest()
+            self._file_hashes[memo_key] = digest
+
+        return digest
+
+    def _can_clone_files_in(self, dir_name):
+        """ Return True if files in a directory can be cloned, i.e. copied so
+        that they share their data until either is changed.
+        """
+
+        if self._can_clone_files is None:
+            os.makedirs(dir_name, exist_ok=True)
+
+            fd, src = tempfile.mkstemp(dir=dir_name)
+            os.write(fd, b'clone')
+            os.close(fd)
+
+            dst = src + '.clone'
+
+            try:
+                _clone_file(src, dst)
+                self._can_clone_files = True
+            except OSError:
+                self._can_clone_files = False
+                self.verbose("Files cannot be cloned")
+
+            for name in (src, dst):
+                if os.path.exists(name):
+                    os.remove(name)
+
+        return self._can_clone_files
+
+    def _clone_file(self, src, dst):
+        """ Copy a file so that, if the file system supports it, the copy
+        shares the data of the original until either is changed.  Note that
+        hard links are not used as builds may change files in place.
+        """
+
+        if self._can_clone_files:
+            try:
+                _clone_file(src, dst)
+                shutil.copystat(src, dst)
+
+                return dst
+            except OSError:
+                pass
+
+        return shutil.copy2(src, dst)
+
+    def _copy_extracted_archive(self, archive, pristine_dir, archive_root, archive_root_path):
+        """ Copy the pristine extracted tree of an archive. """
+
+        pristine_root = os.path.join(pristine_dir, archive_root)
+
+        self.verbose("Copying {0} to {1}".format(pristine_root,
+                archive_root_path))
+
+        try:
+            shutil.copytree(self._long_path(pristine_root),
+                    self._long_path(archive_root_path), symlinks=True,
+                    copy_function=self._clone_file)
+        except Exception as e:
+            self.error("unable to unpack {0}".format(archive), detail=str(e))
+
+    def _extract_archive(self, archive, archive_root):
+        """ Extract an archive to a new temporary directory and return its
+        name.
+        """
+
+        self.verbose("Extracting {0}".format(archive))
+
+        # Components being built concurrently may extract the same archive so
+        # make sure a partially extracted tree is never seen.
+        os.makedirs(self._archives_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self._archives_dir)
+
+        try:
+            if archive.endswith('.zip'):
+                shutil.unpack_archive(archive, self._long_path(temp_dir),
+                        'zip')
+            else:
+                # Decompress the archive as it is read rather than all at once.
+                with tarfile.open(archive, 'r|*') as tf:
+                    tf.extractall(self._long_path(temp_dir))
+        except Exception as e:
+            self.delete_dir(temp_dir)
+            self.error("unable to unpack {0}".format(archive), detail=str(e))
+
+        # Validate the assumption by checking the expected directory exists.
+        if not os.path.isdir(os.path.join(temp_dir, archive_root)):
+            self.delete_dir(temp_dir)
+            self.error(
+                    "unpacking {0} did not create a directory called '{1}' as expected".format(archive, archive_root))
+
+        return temp_dir
+
+    @staticmethod
+    def _long_path(name):
+        """ Return a name that, on Windows, isn't subject to the 256
+        character limit on file names.
+        """
+
+        # The Microsoft work around is to prepend a magic string to an absolute
+        # pathname.
+        if sys.platform == 'win32':
+            return '\\\\?\\' + os.path.abspath(name)
+
+        return name
+
+    def _snapshot_sysroot(self):
+        """ Return a dict, keyed by the name of each file in the system image
+        root directory relative to it, of the state of the file.
+        """
+
+        snapshot = {}
+
+        for dirpath, dirnames, filenames in os.walk(self.sysroot_dir):
+            if dirpath == self.sysroot_dir:
+                # Ignore our own directories.
+                for name in ('build', 'stamps'):
+                    if name in dirnames:
+                        dirnames.remove(name)
+
+            # Symbolic links to directories are not followed so treat them as
+            # files.
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                st = os.lstat(path)
+
+                if name in dirnames and not os.path.islink(path):
+                    continue
+
+                snapshot[os.path.relpath(path, self.sysroot_dir)] = (
+                        st.st_size, st.st_mtime_ns)
+
+        return snapshot
+
+    def _read_stamp(self, component):
+        """ Return a component's stamp or None if there isn't a valid one. """
+
+        try:
+            with open(self._get_stamp_file(component)) as f:
+                stamp = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(stamp, dict) or 'key' not in stamp or 'digest' not in stamp:
+            return None
+
+        return stamp
+
+    def _write_stamp(self, component, key):
+        """ Write the stamp, with a previously calculated key, of a component
+        that has just been built.
+        """
+
+        files = []
+
+        for name in sorted(self._used_files):
+            st = os.stat(name)
+            files.append({'name': name, 'size': st.st_size,
+                    'mtime': st.st_mtime, 'sha256': self._hash_file(name)})
+
+        # The digest is what the stamps of dependent components refer to.
+        digest = hashlib.sha256(key.encode())
+        for used_file in files:
+            digest.update(used_file['sha256'].encode())
+
+        stamp = {'key': key, 'files': files, 'digest': digest.hexdigest()}
+
+        os.makedirs(self._stamps_dir, exist_ok=True)
+
+        stamp_file = self._get_stamp_file(component)
+        with open(stamp_file + '.tmp', 'w') as f:
+            json.dump(stamp, f, indent=4, sort_keys=True)
+
+        os.replace(stamp_file + '.tmp', stamp_file)
+
+    def _get_nr_jobs(self, nr_jobs, memory_per_job):
+        """ Return the number of jobs to run at a time allowing for the
+        number of CPUs and the amount of physical memory.
+        """
+
+        if nr_jobs <= 0:
+            nr_jobs = multiprocessing.cpu_count()
+
+        if memory_per_job > 0:
+            memory = self._get_physical_memory()
+
+            if memory > 0:
+                max_jobs = max(1, memory // (memory_per_job * 1024 * 1024))
+
+                if nr_jobs > max_jobs:
+                    self.verbose(
+                            "Limiting the number of jobs to {0} because of "
+                            "the amount of memory".format(max_jobs))
+                    nr_jobs = max_jobs
+
+        return nr_jobs
+
+    @staticmethod
+    def _get_physical_memory():
+        """ Return the amount of physical memory in bytes or 0 if it is not
+        known.
+        """
+
+        if sys.platform == 'win32':
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ('dwLength', ctypes.c_ulong),
+                    ('dwMemoryLoad', ctypes.c_ulong),
+                    ('ullTotalPhys', ctypes.c_ulonglong),
+                    ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong),
+                    ('ullAvailPageFile', ctypes.c_ulonglong),
+                    ('ullTotalVirtual', ctypes.c_ulonglong),
+                    ('ullAvailVirtual', ctypes.c_ulonglong),
+                    ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+
+            if not ctypes.windll.kernel32.GlobalMemoryStatusEx(
+                    ctypes.byref(status)):
+                return 0
+
+            return status.ullTotalPhys
+
+        try:
+            return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (AttributeError, ValueError, OSError):
+            return 0
+
+    def _set_job_budget(self, nr_jobs, nr_jobs_per_make=None):
+        """ Set the budget of jobs shared by all components and return any
+        jobserver created to manage it.  On hosts that use nmake, rather than
+        GNU make, each invocation of jom (used instead of nmake for qmake
+        generated Makefiles) is given nr_jobs_per_make jobs instead.  If
+        nr_jobs is None then any existing budget is removed.
+        """
+
+        if nr_jobs is None:
+            if self._jobserver is not None:
+                self._jobserver.close()
+                self._jobserver = None
+
+                if self._saved_makeflags is None:
+                    del os.environ['MAKEFLAGS']
+                else:
+                    os.environ['MAKEFLAGS'] = self._saved_makeflags
+
+            self._nr_jobs = 1
+            self._make_args = ()
+            self._pass_fds = ()
+
+            return None
+
+        self._nr_jobs = nr_jobs
+
+        if nr_jobs_per_make is None:
+            nr_jobs_per_make = nr_jobs
+
+        make = self.host_make
+
+        if make == 'nmake':
+            if shutil.which('jom'):
+                self._make_args = ('/J', str(nr_jobs_per_make))
+        elif nr_jobs > 1:
+            # GNU make (and any make that it runs, including those run by
+            # configure scripts) will find the jobserver using MAKEFLAGS.
+            self._jobserver = JobServer(nr_jobs)
+            self._pass_fds = self._jobserver.fds
+
+            self._saved_makeflags = os.environ.get('MAKEFLAGS')
+            os.environ['MAKEFLAGS'] = self._jobserver.makeflags
+
+        return self._jobserver
+
+    def _get_dependencies(self, components):
+        """ Return a dict, keyed by component name, of the set of names of
+        the components being built that each component depends on.  It is
+        assumed that any other components have already been built.
+        """
+
+        names = set([component.name for component in components])
+
+        dependencies = {}
+
+        for component in components:
+            dependencies[component.name] = set(component.dependencies) & names
+
+        return dependencies
+
+    def _sort_components(self, components, dependencies):
+        """ Return a sequence of components sorted so that each component
+        follows those it depends on.  Otherwise the original order is
+        preserved.
+        """
+
+        pending = list(components)
+        built = set()
+        ordered = []
+
+        while pending:
+            for component in pending:
+                if dependencies[component.name] <= built:
+                    break
+            else:
+                self.error(
+                        "the components {0} have circular dependencies".format(
+                                ', '.join(["'{0}'".format(c.name)
+                                        for c in pending])))
+
+            pending.remove(component)
+            built.add(component.name)
+            ordered.append(component)
+
+        return ordered
+
     def _components_from_names(self, component_names):
         """ Return a sequence of components from a sequence of names. """
 
@@ -298,11 +1159,8 @@ class Sysroot:
             self.verbose("Deleting {0}".format(name))
 
             # Windows has a 256 character limit on file names which we can hit.
-            # The Microsoft work around is to prepend a magic string.
-            name_hack = '\\\\?\\' + name if sys.platform == 'win32' else name
-
             try:
-                shutil.rmtree(name_hack)
+                shutil.rmtree(self._long_path(name))
             except Exception as e:
                 self.error("unable to remove directory {0}.".format(name),
                         detail=str(e))
@@ -380,7 +1238,14 @@ class Sysroot:
                         "'{0}' matched several files and directories".format(
                                 name))
 
-            return os.path.normpath(names[0])
+            name = os.path.normpath(names[0])
+
+            # Remember the file so that the component is rebuilt if it
+            # changes.
+            if os.path.isfile(name):
+                self._used_files.add(name)
+
+            return name
 
         if required:
             self.error(
@@ -434,6 +1299,14 @@ class Sysroot:
 
         return self._host.platform.make
 
+    @property
+    def jobs(self):
+        """ The number of jobs, shared by all components, that may be run at
+        a time.
+        """
+
+        return self._nr_jobs
+
     @property
     def host_platform_name(self):
         """ The name of the host platform. """
@@ -544,22 +1417,34 @@ class Sysroot:
         self._message_handler.progress_message(message)
 
     def run(self, *args, capture=False):
-        """ Run a command, optionally capturing stdout. """
+        """ Run a command, optionally capturing stdout.  If the command is
+        the host make then it will run jobs from the budget shared by all
+        components.
+        """
+
+        # jom runs jobs in parallel but can only be relied on to do so safely
+        # with Makefiles generated by qmake.
+        if args and args[0] == self.host_make and self._make_args:
+            if self._is_qmake_makefile(args[1:]):
+                args = ('jom', ) + self._make_args + args[1:]
 
         self._message_handler.verbose_message(
                 "Running '{0}'".format(' '.join(args)))
 
+        # Note that any jobserver is made available to every command so that
+        # makes run indirectly can use it.
         if capture:
             try:
                 stdout = subprocess.check_output(args,
-                        universal_newlines=True, stderr=subprocess.PIPE)
+                        universal_newlines=True, stderr=subprocess.PIPE,
+                        pass_fds=self._pass_fds)
             except subprocess.CalledProcessError as e:
                 self.error("execution of '{0}' failed".format(args[0]),
                         detail=e.stderr)
 
             return stdout.strip()
 
-        subprocess.check_call(args)
+        subprocess.check_call(args, pass_fds=self._pass_fds)
 
         return None
 
@@ -666,21 +1551,9 @@ class Sysroot:
         directory (not it's pathname) is returned.
         """
 
-        # Windows (maybe just 32-bits) has a problem extracting the Qt source
-        # archive (maybe the long pathnames).  As a work around we extract it
-        # to the directory containing the archive and then move it later.
-        archive_dir, archive_name = os.path.split(archive)
-        original_cwd = os.getcwd()
-        os.chdir(archive_dir)
-
-        # Unpack the archive.
-        try:
-            shutil.unpack_archive(archive_name)
-        except Exception as e:
-            self.error("unable to unpack {0}".format(archive), detail=str(e))
-
         # Assume that the name of the extracted directory is the same as the
         # archive without the extension.
+        archive_name = os.path.basename(archive)
         archive_root = None
         for _, extensions, _ in shutil.get_unpack_formats():
             for ext in extensions:
@@ -691,19 +1564,47 @@ class Sysroot:
             if archive_root:
                 break
         else:
-            # This should never happen if we have got this far.
             self.error("'{0}' has an unknown extension".format(archive))
 
-        # Validate the assumption by checking the expected directory exists.
-        if not os.path.isdir(archive_root):
-            self.error(
-                    "unpacking {0} did not create a directory called '{1}' as expected".format(archive, archive_root))
-
-        # Move the extracted archive.
-        archive_root_path = os.path.join(original_cwd, archive_root)
+        archive_root_path = os.path.abspath(archive_root)
         self.delete_dir(archive_root_path)
-        os.rename(archive_root, archive_root_path)
-        os.chdir(original_cwd)
+
+        # A pristine extracted tree is kept, and copied each time the archive
+        # is unpacked, if the copies are cheap or if the archive has already
+        # been unpacked (and so is likely to be unpacked again).  Otherwise the
+        # extracted tree is simply moved into place.
+        digest = self._hash_file(archive)
+        pristine_dir = os.path.join(self._archives_dir, digest[:16])
+
+        if os.path.isdir(pristine_dir):
+            self._copy_extracted_archive(archive, pristine_dir, archive_root,
+                    archive_root_path)
+        elif digest in self._unpacked_archives or self._can_clone_files_in(self._archives_dir):
+            temp_dir = self._extract_archive(archive, archive_root)
+
+            try:
+                os.rename(self._long_path(temp_dir),
+                        self._long_path(pristine_dir))
+            except OSError:
+                # Another process got there first.
+                self.delete_dir(temp_dir)
+
+            self._copy_extracted_archive(archive, pristine_dir, archive_root,
+                    archive_root_path)
+        else:
+            temp_dir = self._extract_archive(archive, archive_root)
+
+            try:
+                shutil.move(
+                        self._long_path(os.path.join(temp_dir, archive_root)),
+                        self._long_path(archive_root_path))
+            except Exception as e:
+                self.error("unable to unpack {0}".format(archive),
+                        detail=str(e))
+
+            self.delete_dir(temp_dir)
+
+        self._unpacked_archives.add(digest)
 
         # Change to the extracted directory if required.
         if chdir:
@@ -738,7 +1639,85 @@ class Sysroot:
         if self._target_py_version_nr is None:
             self._missing_component('python')
 
+    @staticmethod
+    def _is_qmake_makefile(make_args):
+        """ Return True if the Makefile used by nmake with a sequence of
+        arguments was generated by qmake.
+        """
+
+        makefile = 'Makefile'
+
+        for i, arg in enumerate(make_args):
+            if arg.lower() in ('-f', '/f') and i + 1 < len(make_args):
+                makefile = make_args[i + 1]
+
+        try:
+            with open(makefile, encoding='latin-1') as f:
+                header = f.read(1024)
+        except OSError:
+            return False
+
+        return '# Generated by qmake' in header
+
     def _missing_component(self, name):
         """ Raise an exception about a missing component. """
 
         self.error("the sysroot specification must contain an entry for '{0}' before anything that depends on it".format(name))
+
+
+if sys.platform.startswith('linux'):
+    import fcntl
+
+    # The ioctl that clones a file on file systems that support it.
+    _FICLONE = 0x40049409
+
+    def _clone_file(src, dst):
+        """ Clone a file. """
+
+        with open(src, 'rb') as src_f, open(dst, 'wb') as dst_f:
+            fcntl.ioctl(dst_f.fileno(), _FICLONE, src_f.fileno())
+
+elif sys.platform == 'darwin':
+    import ctypes
+    import ctypes.util
+
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+    def _clone_file(src, dst):
+        """ Clone a file. """
+
+        # clonefile() was added in macOS v10.12.
+        clonefile = getattr(_libc, 'clonefile', None)
+        if clonefile is None:
+            raise OSError("clonefile() is not supported")
+
+        if clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), dst)
+
+else:
+    def _clone_file(src, dst):
+        """ Clone a file. """
+
+        raise OSError("cloning files is not supported")
+
+
+def _build_in_process(process_args, quiet, verbose, job_state, component_name):
+    """ Build a single component of a sysroot that has been re-created in
+    the current process.  This is run in a separate process when components
+    are being built concurrently.  job_state is the budget of jobs inherited
+    from the parent process.  A 2-tuple of the text and detail of any error is
+    returned or None if there was no error.
+    """
+
+    try:
+        sysroot = Sysroot(*process_args,
+                message_handler=MessageHandler(quiet, verbose))
+        sysroot._nr_jobs, sysroot._make_args, sysroot._pass_fds = job_state
+        sysroot._configure_components()
+        sysroot._build_component(
+                sysroot._components_from_names([component_name])[0])
+    except UserException as e:
+        return (e.text, e.detail)
+
+    return None
@@ -0,0 +1,276 @@
+# Copyright (c) 2018, Riverbank Computing Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import shlex
+import subprocess
+
+from PyQt5.QtCore import QDir, QFileInfo, QTemporaryDir
+
+from ..file_utilities import get_embedded_dir, read_embedded_file
+from ..metadata import get_python_metadata
+from ..project import QrcDirectory
+from ..user_exception import UserException
+
+
+class Tracer:
+    """ Trace the modules imported by a project's application when run by the
+    host interpreter.
+    """
+
+    def __init__(self, project, message_handler):
+        """ Initialise the tracer for a project. """
+
+        self._project = project
+        self._message_handler = message_handler
+
+    def trace(self, interpreter, sessions):
+        """ Run the application once for each session and return the list of
+        names of the imported modules in the order in which they were first
+        imported.  interpreter is the name of the host interpreter (or None to
+        use the one specified by the project).  sessions is a sequence of
+        strings containing the command line arguments to pass to the
+        application.  Raise a UserException if there is an error.
+        """
+
+        project = self._project
+
+        if project.application_script == '':
+            if len(project.application_entry_point.split(':')) != 2:
+                raise UserException("Either the application script name or "
+                        "the entry point must be specified")
+
+        if interpreter is None:
+            if project.python_host_interpreter != '':
+                interpreter = project.expandvars(
+                        project.python_host_interpreter)
+            else:
+                interpreter = 'python{0}.{1}'.format(
+                        *project.python_target_version[:2])
+
+        # The odd naming of Python source files is to prevent them from being
+        # frozen if we deploy ourself.
+        temp_dir = QTemporaryDir()
+        if not temp_dir.isValid():
+            raise UserException(
+                    "There was an error creating a temporary directory")
+
+        tracer_script = QDir.toNativeSeparators(temp_dir.path() + '/trace.py')
+
+        with open(tracer_script, 'wb') as f:
+            f.write(
+                    read_embedded_file(
+                            self._get_lib_file_name('trace.python')).data())
+
+        argv = [interpreter, tracer_script]
+
+        for path_dir in self._get_path_dirs():
+            argv.append('--path')
+            argv.append(QDir.toNativeSeparators(path_dir))
+
+        if project.application_script != '':
+            argv.append('--script')
+            argv.append(project.path_from_user(project.application_script))
+        else:
+            argv.append('--entry-point')
+            argv.append(project.application_entry_point)
+
+        imported = []
+
+        for nr, session in enumerate(sessions):
+            output = QDir.toNativeSeparators(
+                    temp_dir.path() + '/session{0}.txt'.format(nr))
+
+            session_argv = argv + ['--output', output, '--']
+            session_argv.extend(shlex.split(session))
+
+            self._message_handler.progress_message(
+                    "Running session {0}".format(nr + 1))
+            self._message_handler.verbose_message(
+                    "Running '{0}'".format(' '.join(session_argv)))
+
+            try:
+                subprocess.call(session_argv)
+            except OSError as e:
+                raise UserException(
+                        "Unable to run {0}".format(interpreter), str(e))
+
+            try:
+                with open(output) as f:
+                    names = f.read().split()
+            except OSError as e:
+                raise UserException(
+                        "The application did not exit normally", str(e))
+
+            for name in names:
+                if name not in imported:
+                    imported.append(name)
+
+        return imported
+
+    def compare(self, imported):
+        """ Compare a list of imported modules with the project and return a
+        2-tuple of the standard library modules that should be selected and
+        those that should be deselected.  The packages' contents are updated
+        to reflect the modules that were imported.  Any differences are
+        reported.
+        """
+
+        project = self._project
+
+        # Compare with the standard library.
+        metadata = get_python_metadata(project.python_target_version)
+        required_modules, _ = project.get_stdlib_requirements()
+
+        imported_stdlib = set([name for name in imported if name in metadata])
+
+        stdlib_select = []
+        for name in imported:
+            if name in imported_stdlib and name not in required_modules:
+                module = metadata[name]
+
+                if not module.internal and not module.core:
+                    stdlib_select.append(name)
+
+        stdlib_deselect = [name for name in project.standard_library
+                if name not in imported_stdlib]
+
+        for name in stdlib_select:
+            self._message_handler.message(
+                    "The standard library module {0} is imported but not "
+                    "selected".format(name))
+
+        for name in stdlib_deselect:
+            self._message_handler.message(
+                    "The standard library module {0} is selected but not "
+                    "imported".format(name))
+
+        # Compare with the packages.
+        imported = set(imported)
+
+        if project.application_package.name is not None:
+            package_name = project.application_package.name
+            if package_name != '':
+                package_name = QFileInfo(
+                        project.path_from_user(package_name)).completeBaseName()
+
+            self._compare_contents(project.application_package.contents,
+                    [package_name] if package_name else [], imported)
+
+        for package in project.other_packages:
+            self._compare_contents(package.contents, [], imported)
+
+        return stdlib_select, stdlib_deselect
+
+    def update(self, stdlib_select, stdlib_deselect):
+        """ Update and save the project.  Raise a UserException if there is an
+        error.
+        """
+
+        project = self._project
+
+        standard_library = [name for name in project.standard_library
+                if name not in stdlib_deselect]
+        standard_library.extend(stdlib_select)
+
+        project.standard_library = standard_library
+
+        project.save()
+
+    def _compare_contents(self, contents, package_parts, imported):
+        """ Compare the contents of a package directory with the imported
+        modules and update the included flags accordingly.  Return True if
+        anything in the directory was imported.
+        """
+
+        any_imported = False
+
+        for content in contents:
+            if isinstance(content, QrcDirectory):
+                if self._compare_contents(content.contents,
+                        package_parts + [content.name], imported):
+                    any_imported = True
+
+                    if not content.included:
+                        self._message_handler.message(
+                                "{0} is excluded but contains imported "
+                                "modules".format(
+                                        '/'.join(package_parts +
+                                                [content.name])))
+                        content.included = True
+
+                continue
+
+            base_name, ext = os.path.splitext(content.name)
+            if ext not in ('.py', '.pyw'):
+                continue
+
+            if base_name == '__init__':
+                name = '.'.join(package_parts)
+            else:
+                name = '.'.join(package_parts + [base_name])
+
+            is_imported = (name in imported)
+
+            if is_imported != content.included:
+                self._message_handler.message(
+                        "{0} is {1}".format(name,
+                                "imported but not included" if is_imported
+                                        else "included but not imported"))
+                content.included = is_imported
+
+            if is_imported:
+                any_imported = True
+
+        return any_imported
+
+    def _get_path_dirs(self):
+        """ Return the list of directories that need to be on sys.path so that
+        the application's packages can be imported.
+        """
+
+        project = self._project
+        path_dirs = []
+
+        if project.application_package.name is not None:
+            package_dir = project.path_from_user(
+                    project.application_package.name)
+
+            if project.application_package.name != '':
+                package_dir = QFileInfo(package_dir).absolutePath()
+
+            path_dirs.append(package_dir)
+
+        for package in project.other_packages:
+            path_dirs.append(project.path_from_user(package.name))
+
+        return path_dirs
+
+    @staticmethod
+    def _get_lib_file_name(file_name):
+        """ Get name of a file in the 'lib' sub-directory. """
+
+        return get_embedded_dir(__file__, 'lib').absoluteFilePath(file_name)
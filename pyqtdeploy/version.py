@@ -0,0 +1,2 @@
+PYQTDEPLOY_RELEASE = '2.1.dev0'
+PYQTDEPLOY_HEXVERSION = 0x020100
@@ -69,13 +69,15 @@ setup(
         packages=find_packages(),
         package_data={
             'pyqtdeploy.builder': ['lib/*.*', 'lib/*/*.*'],
+            'pyqtdeploy.tracer': ['lib/*.*'],
             'pyqtdeploy.sysroot.plugins.python': ['configurations/*.*',
                     'configurations/*/*.*']
         },
         entry_points={
             'console_scripts': [
                 'pyqtdeploy-build = pyqtdeploy.pyqtdeploybuild_main:main',
-                'pyqtdeploy-sysroot = pyqtdeploy.pyqtdeploysysroot_main:main'],
+                'pyqtdeploy-sysroot = pyqtdeploy.pyqtdeploysysroot_main:main',
+                'pyqtdeploy-trace = pyqtdeploy.pyqtdeploytrace_main:main'],
             'gui_scripts': [
                 'pyqtdeploy = pyqtdeploy.pyqtdeploy_main:main']
         }
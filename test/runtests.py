@@ -55,13 +55,13 @@ class TargetTests:
 
         return test_type(target, os.path.abspath(test))
 
-    def run(self, no_clean, verbose):
+    def run(self, no_clean, verbose, cache_dir=None):
         """ Run the tests. """
 
         for test in self._tests:
-            self.run_test(test, no_clean, verbose)
+            self.run_test(test, no_clean, verbose, cache_dir)
 
-    def run_test(self, test, no_clean, verbose):
+    def run_test(self, test, no_clean, verbose, cache_dir):
         """ Re-implemented to run a single test. """
 
         raise NotImplementedError
@@ -88,7 +88,7 @@ class TargetSysrootTests(TargetTests):
     # The filename exyension of pyqtdeploy-sysroot tests.
     test_extension = '.json'
 
-    def run_test(self, test, no_clean, verbose):
+    def run_test(self, test, no_clean, verbose, cache_dir):
         """ Run a pyqtdeploy-sysroot test. """
 
         print("Building sysroot from {}".format(test))
@@ -98,7 +98,16 @@ class TargetSysrootTests(TargetTests):
         sysroot = os.path.join('sysroot',
                 '{0}-{1}'.format(self.target, test_name))
 
-        # Run pyqtdeploy-sysroot.
+        self._build_sysroot(test, sysroot, no_clean, verbose, cache_dir)
+
+        print("Build of sysroot from {} successful".format(test))
+
+        if cache_dir:
+            self._test_cache(test, sysroot, no_clean, verbose, cache_dir)
+
+    def _build_sysroot(self, test, sysroot, no_clean, verbose, cache_dir, force=False):
+        """ Run pyqtdeploy-sysroot. """
+
         args = ['pyqtdeploy-sysroot']
 
         if no_clean:
@@ -107,6 +116,12 @@ class TargetSysrootTests(TargetTests):
         if verbose:
             args.append('--verbose')
 
+        if cache_dir:
+            args.extend(['--cache-dir', cache_dir])
+
+        if force:
+            args.append('--force')
+
         args.extend(['--source-dir', os.path.join('..', 'demo', 'src')])
         args.extend(['--target', self.target])
         args.extend(['--sysroot', sysroot])
@@ -115,7 +130,73 @@ class TargetSysrootTests(TargetTests):
         self.call(args, verbose,
                 "Build of sysroot from {} failed".format(test))
 
-        print("Build of sysroot from {} successful".format(test))
+    def _test_cache(self, test, sysroot, no_clean, verbose, cache_dir):
+        """ Test that a sysroot built with a cache of component installs
+        can be re-created from the cache and that the cache is not used for a
+        sysroot in a different directory.
+        """
+
+        print("Testing the cache with sysroot from {}".format(test))
+
+        # Re-creating the sysroot should restore every component.
+        files = self._get_sysroot_files(sysroot)
+        self._build_sysroot(test, sysroot, no_clean, verbose, cache_dir,
+                force=True)
+
+        if self._get_sysroot_files(sysroot) != files:
+            raise UserException(
+                    "Sysroot restored from the cache is different")
+
+        # A sysroot in a different directory must not contain anything that
+        # refers to the original one.  Note that its name must not start with
+        # the name of the original.
+        sysroot_dir, sysroot_name = os.path.split(sysroot)
+        relocated = os.path.join(sysroot_dir, 'relocated-' + sysroot_name)
+        self._build_sysroot(test, relocated, no_clean, verbose, cache_dir,
+                force=True)
+
+        original = os.path.abspath(sysroot).encode()
+
+        for name in self._get_sysroot_files(relocated):
+            path = os.path.join(relocated, name)
+
+            if os.path.islink(path):
+                if os.readlink(path).encode().startswith(original):
+                    raise UserException(
+                            "{0} refers to the original sysroot".format(path))
+
+                continue
+
+            with open(path, 'rb') as f:
+                if original in f.read():
+                    raise UserException(
+                            "{0} refers to the original sysroot".format(path))
+
+        if not no_clean:
+            shutil.rmtree(relocated)
+
+        print("Test of the cache with sysroot from {} successful".format(
+                test))
+
+    @staticmethod
+    def _get_sysroot_files(sysroot):
+        """ Return the set of the names of the files installed in a sysroot
+        relative to it.
+        """
+
+        files = set()
+
+        for dirpath, dirnames, filenames in os.walk(sysroot):
+            if dirpath == sysroot:
+                for name in ('build', 'stamps'):
+                    if name in dirnames:
+                        dirnames.remove(name)
+
+            for name in filenames:
+                files.add(
+                        os.path.relpath(os.path.join(dirpath, name), sysroot))
+
+        return files
 
 
 class TargetStdlibTests(TargetTests):
@@ -125,7 +206,7 @@ class TargetStdlibTests(TargetTests):
     # The filename exyension of pyqtdeploy-build tests.
     test_extension = '.pdy'
 
-    def run_test(self, test, no_clean, verbose):
+    def run_test(self, test, no_clean, verbose, cache_dir):
         """ Run a pyqtdeploy-build test. """
 
         print("Building application from {}".format(test))
@@ -143,6 +224,8 @@ class TargetStdlibTests(TargetTests):
         if verbose:
             args.append('--verbose')
 
+        # pyqtdeploy-build runs qmake and make itself.
+        args.append('--make')
         args.extend(['--target', self.target])
         args.extend(['--sysroot', sysroot])
         args.append(test)
@@ -150,15 +233,7 @@ class TargetStdlibTests(TargetTests):
         self.call(args, verbose,
                 "pyqtdeploy-build using {} failed".format(test))
 
-        # Change to the build directory and run qmake and make.
         build_dir = 'build-' + self.target
-        qmake = os.path.abspath(os.path.join(sysroot, 'host', 'bin', 'qmake'))
-        make = 'nmake' if sys.platform == 'win32' else 'make'
-
-        os.chdir(build_dir)
-        self.call([qmake], verbose, "qmake failed")
-        self.call([make], verbose, "make failed")
-        os.chdir('..')
 
         if not no_clean:
             shutil.rmtree(build_dir)
@@ -173,6 +248,9 @@ if __name__ == '__main__':
     # Parse the command line.
     parser = argparse.ArgumentParser()
 
+    parser.add_argument('--cache-dir',
+            help="test the cache of component installs using DIR",
+            metavar="DIR")
     parser.add_argument('--no-clean',
             help="do not remove the temporary build directories",
             action='store_true')
@@ -190,8 +268,9 @@ if __name__ == '__main__':
     # Run a specific test or all of them.
     if args.test:
         TargetTests.factory(args.target, args.test).run(args.no_clean,
-                args.verbose)
+                args.verbose, args.cache_dir)
     else:
         # The sysroot tests must be run first.
-        TargetSysrootTests(args.target).run(args.no_clean, args.verbose)
+        TargetSysrootTests(args.target).run(args.no_clean, args.verbose,
+                args.cache_dir)
         TargetStdlibTests(args.target).run(args.no_clean, args.verbose)